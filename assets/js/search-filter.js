@@ -31,15 +31,18 @@ const filterStream = () => {
 
   const statusEl = document.querySelector("#search-status");
   const posts = Array.from(document.querySelectorAll(".post"));
-  const searchableText = posts.map((post) =>
-    normalizeText(post.textContent || "")
-  );
   const totalPosts = posts.length;
+  // Normalized lazily: most visits never type in the filter.
+  let searchableText = null;
 
   const handleInput = () => {
     const query = normalizeText(input.value);
     let matches = 0;
 
+    if (query && searchableText === null) {
+      searchableText = posts.map((post) => normalizeText(post.textContent || ""));
+    }
+
     posts.forEach((post, index) => {
       const isMatch = !query || searchableText[index].includes(query);
       post.hidden = !isMatch;
@@ -1,15 +1,174 @@
+const SEARCH_INDEX_URL = "../data/search/";
+const RESULTS_PAGE_SIZE = 10;
+
 const getQuery = () => {
   const params = new URLSearchParams(window.location.search);
   return (params.get("q") || "").trim();
 };
 
-const updateSearchPage = () => {
+const normalizeText = (value) =>
+  value
+    .toLowerCase()
+    .normalize("NFD")
+    .replace(/[\u0300-\u036f]/g, "")
+    .trim();
+
+const fetchJson = (() => {
+  const cache = new Map();
+  return (name) => {
+    if (!cache.has(name)) {
+      cache.set(
+        name,
+        fetch(`${SEARCH_INDEX_URL}${name}.json`).then((response) =>
+          response.ok ? response.json() : {}
+        )
+      );
+    }
+    return cache.get(name);
+  };
+})();
+
+const queryTerms = (query, table) => {
+  const stopwords = new Set(table.stopwords);
+  const tokens = normalizeText(query).match(/[a-z0-9]+/g) || [];
+  return tokens.filter(
+    (token) => token.length >= table.prefix && !stopwords.has(token)
+  );
+};
+
+// Scores for one query term. The last term of the query also matches as a
+// prefix so results appear while the reader is still typing.
+const scoreTerm = (shard, term, isPrefix) => {
+  const scores = new Map();
+  Object.keys(shard).forEach((candidate) => {
+    if (candidate !== term && !(isPrefix && candidate.startsWith(term))) {
+      return;
+    }
+    shard[candidate].forEach(([doc, score]) => {
+      scores.set(doc, Math.max(scores.get(doc) || 0, score));
+    });
+  });
+  return scores;
+};
+
+const search = async (query) => {
+  const table = await fetchJson("index");
+  if (!table.docs) {
+    return [];
+  }
+
+  const terms = queryTerms(query, table);
+  if (!terms.length) {
+    return [];
+  }
+
+  const available = new Set(table.shards);
+  const shards = await Promise.all(
+    terms.map((term) => {
+      const prefix = term.slice(0, table.prefix);
+      return available.has(prefix) ? fetchJson(prefix) : Promise.resolve({});
+    })
+  );
+
+  let totals = null;
+  terms.forEach((term, index) => {
+    const scores = scoreTerm(shards[index], term, index === terms.length - 1);
+    const next = new Map();
+    scores.forEach((score, doc) => {
+      if (totals === null || totals.has(doc)) {
+        next.set(doc, (totals ? totals.get(doc) : 0) + score);
+      }
+    });
+    totals = next;
+  });
+
+  return Array.from(totals.entries()).map(([doc, score]) => ({ doc, score }));
+};
+
+// Each record's category lives in categories.json, fetched the first time a
+// category filter is checked.
+const filterByCategory = async (results, selected) => {
+  if (!selected.size) {
+    return results;
+  }
+  const categories = await fetchJson("categories");
+  const slugs = categories.slugs || [];
+  const docs = categories.docs || [];
+  return results.filter((result) => selected.has(slugs[docs[result.doc]]));
+};
+
+// Result records are split into files of table.docsPerShard; only the files
+// holding the results about to be shown are fetched.
+const loadRecords = async (results) => {
+  const table = await fetchJson("index");
+  const missing = results.filter((result) => result.url === undefined);
+  const chunks = await Promise.all(
+    missing.map((result) => fetchJson(`docs-${Math.floor(result.doc / table.docsPerShard)}`))
+  );
+  missing.forEach((result, index) => {
+    const record = chunks[index][result.doc % table.docsPerShard] || [];
+    table.fields.forEach((field, position) => {
+      result[field] = record[position] || "";
+    });
+  });
+};
+
+const createElement = (tag, className, text) => {
+  const element = document.createElement(tag);
+  if (className) {
+    element.className = className;
+  }
+  if (text) {
+    element.textContent = text;
+  }
+  return element;
+};
+
+const renderResult = (result) => {
+  const card = createElement("article", "result-card");
+  const url = `../${result.url}`;
+
+  if (result.image) {
+    const thumbLink = document.createElement("a");
+    thumbLink.href = url;
+    const thumb = createElement("img", "result-card__thumb");
+    thumb.src = result.image;
+    thumb.alt = result.alt;
+    thumb.loading = "lazy";
+    thumbLink.append(thumb);
+    card.append(thumbLink);
+  }
+
+  const content = createElement("div", "result-card__content");
+  const meta = createElement("div", "result-card__meta");
+  meta.append(
+    createElement("span", "result-card__badge", result.category),
+    createElement("span", "", result.date)
+  );
+
+  const title = createElement("h2", "result-card__title");
+  const titleLink = createElement("a", "post__title-link", result.title);
+  titleLink.href = url;
+  title.append(titleLink);
+
+  const footer = createElement("div", "result-card__footer");
+  footer.append(createElement("span", "", result.author));
+
+  content.append(meta, title, createElement("p", "", result.summary), footer);
+  card.append(content);
+  return card;
+};
+
+const updateSearchPage = async () => {
   const query = getQuery();
   const term = query || "todo";
   const termEl = document.querySelector("[data-search-term]");
   const countEl = document.querySelector("[data-results-count]");
+  const listEl = document.querySelector("[data-search-results]");
+  const moreButton = document.querySelector("[data-search-more]");
+  const sortButtons = document.querySelectorAll("[data-search-sort]");
+  const categoryInputs = document.querySelectorAll('input[name="categoria"]');
   const inputs = document.querySelectorAll('input[name="q"]');
-  const results = document.querySelectorAll(".result-card");
 
   inputs.forEach((input) => {
     input.value = query;
@@ -19,14 +178,119 @@ const updateSearchPage = () => {
     termEl.textContent = term;
   }
 
-  if (countEl) {
-    const count = results.length;
-    countEl.textContent = `Se encontraron ${count} artículos.`;
-  }
-
   document.title = query
     ? `ANXiNA · Resultados para “${query}”`
     : "ANXiNA · Resultados de búsqueda";
+
+  if (!listEl) {
+    return;
+  }
+
+  let results = [];
+  try {
+    results = query ? await search(query) : [];
+  } catch (error) {
+    if (countEl) {
+      countEl.textContent = "No se pudo cargar el índice de búsqueda.";
+    }
+    return;
+  }
+
+  let visible = results;
+  let shown = 0;
+  let order = "relevance";
+  let generation = 0;
+  let filterGeneration = 0;
+
+  const sortResults = () => {
+    visible.sort((a, b) =>
+      order === "recent" ? a.doc - b.doc : b.score - a.score || a.doc - b.doc
+    );
+  };
+
+  const showMore = async () => {
+    const current = generation;
+    const page = visible.slice(shown, shown + RESULTS_PAGE_SIZE);
+    shown = Math.min(visible.length, shown + RESULTS_PAGE_SIZE);
+    if (moreButton) {
+      moreButton.hidden = shown >= visible.length;
+    }
+    try {
+      await loadRecords(page);
+    } catch (error) {
+      if (countEl) {
+        countEl.textContent = "No se pudo cargar el índice de búsqueda.";
+      }
+      return;
+    }
+    // A new sort started while the records loaded; it renders its own page.
+    if (current !== generation) {
+      return;
+    }
+    const fragment = document.createDocumentFragment();
+    page.forEach((result) => {
+      fragment.append(renderResult(result));
+    });
+    listEl.append(fragment);
+  };
+
+  const render = () => {
+    generation += 1;
+    sortResults();
+    listEl.replaceChildren();
+    shown = 0;
+    showMore();
+  };
+
+  const applyFilters = async () => {
+    const current = ++filterGeneration;
+    const selected = new Set(
+      Array.from(categoryInputs)
+        .filter((input) => input.checked)
+        .map((input) => input.value)
+    );
+    let filtered;
+    try {
+      filtered = await filterByCategory(results, selected);
+    } catch (error) {
+      if (countEl) {
+        countEl.textContent = "No se pudo cargar el índice de búsqueda.";
+      }
+      return;
+    }
+    // Another checkbox changed while categories.json loaded.
+    if (current !== filterGeneration) {
+      return;
+    }
+    visible = filtered;
+    if (countEl) {
+      countEl.textContent =
+        visible.length === 1
+          ? "Se encontró 1 artículo."
+          : `Se encontraron ${visible.length} artículos.`;
+    }
+    render();
+  };
+
+  sortButtons.forEach((button) => {
+    button.addEventListener("click", () => {
+      order = button.dataset.searchSort;
+      sortButtons.forEach((other) => {
+        other.classList.toggle("is-active", other === button);
+      });
+      render();
+    });
+  });
+
+  categoryInputs.forEach((input) => {
+    input.addEventListener("change", applyFilters);
+  });
+
+  if (moreButton) {
+    moreButton.addEventListener("click", showMore);
+  }
+
+  applyFilters();
 };
 
 if (document.readyState === "loading") {
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the build pipeline in build_posts.py."""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import html
+import random
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import build_posts
+from build_posts import (
+    BuildMetrics,
+    Post,
+    RelatedIndex,
+    SimilarityIndex,
+    minhash_signature,
+    render_body_markdown,
+    render_portada,
+    render_post,
+    render_stream,
+    select_related,
+    similarity_terms,
+)
+from generate_corpus import WORDS, synthetic_body, write_corpus
+
+TAG_VOCABULARY = 400
+
+
+def synthetic_posts(count: int, seed: int = 2025, body: str = "") -> list[Post]:
+    """Posts with a Zipf-like tag distribution, newest first."""
+    rng = random.Random(seed)
+    vocabulary = [f"tag{number}" for number in range(TAG_VOCABULARY)]
+    weights = [1 / (rank + 1) for rank in range(TAG_VOCABULARY)]
+    start = build_posts.dt.datetime(2020, 1, 1)
+    posts: list[Post] = []
+    for number in range(count):
+        published_at = start + build_posts.dt.timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+        tags = sorted(set(rng.choices(vocabulary, weights=weights, k=rng.randint(1, 5))))
+        posts.append(
+            Post(
+                title=f"Post {number}",
+                body=body,
+                tags=tags,
+                date=published_at.strftime("%Y-%m-%d"),
+                time=published_at.strftime("%H:%M"),
+                author="Tepokato",
+                summary=f"Resumen del post {number} con <etiquetas> & acentos.",
+                featured_image="assets/img/pebe1.png",
+                featured_image_alt=f"Imagen del post {number}",
+                slug=f"post-{number}",
+                category="Tecnología",
+                status="published",
+                notes="",
+                source_path=Path(f"post-{number}.txt"),
+            )
+        )
+    posts.sort(key=lambda post: post.datetime, reverse=True)
+    return posts
+
+
+def bench_related(args: argparse.Namespace) -> None:
+    posts = synthetic_posts(args.posts)
+    sample = random.Random(7).sample(posts, min(args.sample, len(posts)))
+
+    started = time.perf_counter()
+    expected = [select_related(post, posts) for post in sample]
+    naive_per_post = (time.perf_counter() - started) / len(sample)
+
+    started = time.perf_counter()
+    index = RelatedIndex(posts)
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = [index.select(post) for post in posts]
+    indexed_total = built + time.perf_counter() - started
+
+    by_slug = {post.slug: related for post, related in zip(posts, actual)}
+    mismatches = sum(1 for post, related in zip(sample, expected) if by_slug[post.slug] != related)
+
+    naive_total = naive_per_post * len(posts)
+    print(f"posts: {len(posts)} (naive timed on a sample of {len(sample)})")
+    print(f"select_related (projected): {naive_total:.2f}s")
+    print(f"RelatedIndex (build {built:.3f}s): {indexed_total:.2f}s")
+    print(f"speedup: {naive_total / indexed_total:.1f}x")
+    print(f"mismatches in sample: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+def bench_render(args: argparse.Namespace) -> None:
+    paragraph = "Texto de ejemplo con <marcas> & acentos: canción, pingüino. " * 8
+    body = "\n\n".join(["## Sección", paragraph, "- uno\n- dos", paragraph] * 4)
+    posts = synthetic_posts(args.posts, body=body)
+    authors = build_posts.load_authors()
+    index = RelatedIndex(posts)
+    jobs = [(post, index.select(post), authors.get(post.author)) for post in posts]
+
+    started = time.perf_counter()
+    for post, related, author in jobs:
+        render_post(post, related, author)
+    pages = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for start in range(0, len(posts), 6):
+        render_portada(posts[start])
+        render_stream(posts[start + 1 : start + 6])
+    cards = time.perf_counter() - started
+
+    print(f"posts: {len(posts)}")
+    print(f"render_post: {pages:.3f}s ({pages / len(posts) * 1e6:.0f} us/page)")
+    print(f"render_portada + render_stream: {cards:.3f}s")
+
+
+def topical_posts(count: int, topics: int, seed: int = 2025) -> tuple[list[Post], dict[str, int]]:
+    """Posts written about one hidden topic each, with noisy tags, newest first.
+
+    Each topic has its own vocabulary mixed into generic filler text; only
+    some posts carry their topic's tag, the rest get popular Zipf tags.
+    """
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ra", "su", "te", "vo", "ne", "pi", "da", "zu", "ye"]
+    vocabularies = [
+        ["".join(rng.choices(syllables, k=rng.randint(3, 4))) for _ in range(40)] for _ in range(topics)
+    ]
+    popular = [f"tag{number}" for number in range(20)]
+    weights = [1 / (rank + 1) for rank in range(len(popular))]
+    start = build_posts.dt.datetime(2020, 1, 1)
+    posts: list[Post] = []
+    topic_of: dict[str, int] = {}
+    for number in range(count):
+        topic = rng.randrange(topics)
+        words = [rng.choice(vocabularies[topic]) if rng.random() < 0.25 else rng.choice(WORDS) for _ in range(300)]
+        tags = set(rng.choices(popular, weights=weights, k=rng.randint(1, 3)))
+        if rng.random() < 0.4:
+            tags.add(f"tema{topic}")
+        published_at = start + build_posts.dt.timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+        slug = f"post-{number}"
+        topic_of[slug] = topic
+        posts.append(
+            Post(
+                title=" ".join(rng.choices(vocabularies[topic], k=2) + rng.choices(WORDS, k=3)),
+                body=" ".join(words),
+                tags=sorted(tags),
+                date=published_at.strftime("%Y-%m-%d"),
+                time=published_at.strftime("%H:%M"),
+                author="Tepokato",
+                summary="",
+                featured_image="",
+                featured_image_alt="",
+                slug=slug,
+                category="Tecnología",
+                status="published",
+                notes="",
+                source_path=Path(f"{slug}.txt"),
+            )
+        )
+    posts.sort(key=lambda post: post.datetime, reverse=True)
+    return posts, topic_of
+
+
+def bench_similar(args: argparse.Namespace) -> None:
+    posts, topic_of = topical_posts(args.posts, args.topics)
+    print(f"posts: {len(posts)}, temas ocultos: {args.topics}")
+    print(f"{'engine':>8} {'index':>8} {'select':>8} {'precision@3':>12} {'coverage':>9}")
+    for label in ("tags", "similar"):
+        started = time.perf_counter()
+        index = RelatedIndex(posts)
+        if label == "similar":
+            signatures = {post.slug: minhash_signature(similarity_terms(post, post.body)) for post in posts}
+            index = SimilarityIndex(posts, signatures, index)
+        indexing = time.perf_counter() - started
+
+        started = time.perf_counter()
+        chosen = [(post, index.select(post)) for post in posts]
+        selecting = time.perf_counter() - started
+
+        picks = [(post, related) for post, related in chosen for related in related]
+        hits = sum(1 for post, related in picks if topic_of[post.slug] == topic_of[related.slug])
+        covered = sum(1 for _, related in chosen if len(related) == 3)
+        print(
+            f"{label:>8} {indexing:>7.2f}s {selecting:>7.2f}s "
+            f"{hits / max(1, len(picks)):>12.2f} {covered / len(posts):>9.2f}"
+        )
+
+
+def legacy_render_body_markdown(text: str) -> str:
+    """The original headings/lists/paragraphs renderer, kept as a baseline."""
+    lines = text.splitlines()
+    html_lines: list[str] = []
+    paragraph: list[str] = []
+    in_list = False
+
+    def flush_paragraph() -> None:
+        nonlocal paragraph
+        if paragraph:
+            content = " ".join(html.escape(line.strip()) for line in paragraph if line.strip())
+            html_lines.append(f"        <p>{content}</p>")
+            paragraph = []
+
+    def close_list() -> None:
+        nonlocal in_list
+        if in_list:
+            html_lines.append("        </ul>")
+            in_list = False
+
+    for raw_line in lines:
+        stripped = raw_line.rstrip().strip()
+        if not stripped:
+            flush_paragraph()
+            close_list()
+            continue
+        heading_match = re.match(r"^(#{1,3})\s+(.*)", stripped)
+        if heading_match:
+            flush_paragraph()
+            close_list()
+            level = len(heading_match.group(1))
+            html_lines.append(f"        <h{level}>{html.escape(heading_match.group(2))}</h{level}>")
+            continue
+        if stripped.startswith("- "):
+            flush_paragraph()
+            if not in_list:
+                html_lines.append("        <ul>")
+                in_list = True
+            html_lines.append(f"          <li>{html.escape(stripped[2:].strip())}</li>")
+            continue
+        paragraph.append(stripped)
+
+    flush_paragraph()
+    close_list()
+    return "\n".join(html_lines)
+
+
+MARKDOWN_BLOCK = """## Sección de ejemplo
+
+Un párrafo con **negritas**, *énfasis*, `código` y un [enlace](https://example.com).
+La segunda línea del párrafo sigue aquí con <etiquetas> & símbolos.
+
+- primer punto
+- segundo punto
+
+1. paso uno
+2. paso dos
+
+> Una cita con _énfasis_.
+
+```python
+print("hola")
+```
+
+"""
+
+
+def corpus_body(kilobytes: int, seed: int = 2025) -> str:
+    """Synthetic post bodies joined up to ``kilobytes``: mostly plain prose."""
+    rng = random.Random(seed)
+    blocks: list[str] = []
+    size = 0
+    while size < kilobytes * 1024:
+        blocks.append(synthetic_body(rng))
+        size += len(blocks[-1].encode("utf-8")) + 2
+    return "\n\n".join(blocks)
+
+
+def bench_markdown(args: argparse.Namespace) -> None:
+    # MARKDOWN_BLOCK puts inline syntax on nearly every line, which the legacy
+    # renderer does not even parse; the corpus bodies are closer to real posts.
+    print(f"{'texto':>8} {'body':>10} {'legacy':>10} {'streaming':>10}")
+    for kilobytes in args.sizes:
+        bodies = {
+            "bloque": MARKDOWN_BLOCK * max(1, kilobytes * 1024 // len(MARKDOWN_BLOCK.encode("utf-8"))),
+            "corpus": corpus_body(kilobytes),
+        }
+        for label, body in bodies.items():
+            timings = []
+            for renderer in (legacy_render_body_markdown, render_body_markdown):
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    renderer(body)
+                timings.append((time.perf_counter() - started) / args.repeat)
+            print(f"{label:>8} {kilobytes:>8}KB {timings[0] * 1e3:>8.1f}ms {timings[1] * 1e3:>8.1f}ms")
+
+
+@dataclasses.dataclass
+class LegacyPost:
+    """The original unslotted Post that re-parses its datetime on access."""
+
+    title: str
+    body: str
+    tags: list[str]
+    date: str
+    time: str
+    author: str
+    summary: str
+    featured_image: str
+    featured_image_alt: str
+    slug: str
+    category: str
+    status: str
+    notes: str
+    source_path: Path
+    source_hash: str = ""
+
+    @property
+    def datetime(self) -> build_posts.dt.datetime:
+        return build_posts.dt.datetime.strptime(f"{self.date} {self.time}", "%Y-%m-%d %H:%M")
+
+
+def fresh_copy(value: object) -> object:
+    """A new object equal to ``value``, as if it had just been parsed."""
+    if isinstance(value, str):
+        return "".join(value)
+    if isinstance(value, list):
+        return [fresh_copy(item) for item in value]
+    return value
+
+
+def load_corpus(model: type, records: list[dict]) -> list:
+    return [model(**{key: fresh_copy(value) for key, value in record.items()}) for record in records]
+
+
+def bench_model(args: argparse.Namespace) -> None:
+    fields = [field.name for field in dataclasses.fields(LegacyPost)]
+    records = [
+        {field: getattr(post, field) for field in fields}
+        for post in synthetic_posts(args.posts)
+    ]
+    print(f"posts: {args.posts}")
+    print(f"{'model':>8} {'memory':>10} {'load':>8} {'sort':>8} {'index':>8} {'json-ld':>8}")
+    for label, model in (("legacy", LegacyPost), ("slotted", Post)):
+        tracemalloc.start()
+        posts = load_corpus(model, records)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del posts
+
+        started = time.perf_counter()
+        posts = load_corpus(model, records)
+        loading = time.perf_counter() - started
+
+        started = time.perf_counter()
+        ordered = sorted(posts, key=lambda post: post.datetime, reverse=True)
+        sorting = time.perf_counter() - started
+
+        started = time.perf_counter()
+        RelatedIndex(ordered)
+        indexing = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for post in ordered:
+            post.datetime.isoformat()
+            post.datetime.isoformat()
+            post.datetime.isoformat()
+        json_ld = time.perf_counter() - started
+
+        print(
+            f"{label:>8} {size / 2**20:>8.1f}MB {loading:>7.2f}s {sorting:>7.2f}s {indexing:>7.2f}s {json_ld:>7.2f}s"
+        )
+
+
+def synthetic_site(root: Path, directory: Path, count: int) -> None:
+    """A copy of ``root``'s site chrome with ``count`` generated post sources."""
+    shutil.copy2(root / "index.html", directory / "index.html")
+    shutil.copytree(root / "templates", directory / "templates")
+    (directory / "data").mkdir()
+    shutil.copy2(root / "data" / "authors.json", directory / "data" / "authors.json")
+    (directory / "pages").mkdir()
+    write_corpus(directory / "posts", count)
+
+
+def bench_build(args: argparse.Namespace) -> None:
+    original_root = build_posts.ROOT
+    try:
+        for count in args.sizes:
+            with tempfile.TemporaryDirectory(prefix="anxina-bench-") as directory:
+                started = time.perf_counter()
+                synthetic_site(original_root, Path(directory), count)
+                generated = time.perf_counter() - started
+                build_posts.set_root(Path(directory))
+                print(f"== {count} posts (corpus generated in {generated:.2f}s)")
+                for label in ("cold", "no-op"):
+                    metrics = BuildMetrics()
+                    rendered = build_posts.build(workers=args.jobs, keep_sources=True, metrics=metrics)
+                    print(f"-- {label} build: {len(rendered)} pages rendered")
+                    print(metrics.format_table())
+    finally:
+        build_posts.set_root(original_root)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    related = subparsers.add_parser("related", help="select_related frente a RelatedIndex")
+    related.add_argument("--posts", type=int, default=10_000)
+    related.add_argument("--sample", type=int, default=300)
+    related.set_defaults(func=bench_related)
+
+    render = subparsers.add_parser("render", help="render_post y las tarjetas del índice")
+    render.add_argument("--posts", type=int, default=2_000)
+    render.set_defaults(func=bench_render)
+
+    markdown = subparsers.add_parser("markdown", help="render_body_markdown frente al renderer original")
+    markdown.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 400, 1600], metavar="KB")
+    markdown.add_argument("--repeat", type=int, default=3)
+    markdown.set_defaults(func=bench_markdown)
+
+    similar = subparsers.add_parser("similar", help="relacionados por etiquetas frente a MinHash/LSH")
+    similar.add_argument("--posts", type=int, default=10_000)
+    similar.add_argument("--topics", type=int, default=200)
+    similar.set_defaults(func=bench_similar)
+
+    model = subparsers.add_parser("model", help="memoria y tiempo del modelo Post")
+    model.add_argument("--posts", type=int, default=100_000)
+    model.set_defaults(func=bench_model)
+
+    build = subparsers.add_parser("build", help="build completo sobre un corpus sintético")
+    build.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000], metavar="POSTS")
+    build.add_argument("--jobs", "-j", type=int, default=1)
+    build.set_defaults(func=bench_build)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,176 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import argparse
+import array
+import collections
+import contextlib
 import dataclasses
 import datetime as dt
+import email.utils
+import functools
+import gzip
+import hashlib
+import heapq
 import html
+import io
+import itertools
 import json
+import operator
+import os
 import re
+import sqlite3
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable, Iterator, TextIO
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:  # pragma: no cover - fontTools is optional
+    font_subset = None
 
 ROOT = Path(__file__).resolve().parent.parent
 POSTS_DIR = ROOT / "posts"
 INDEX_PATH = ROOT / "index.html"
+PAGES_DIR = ROOT / "pages"
 AUTHORS_PATH = ROOT / "data" / "authors.json"
+TEMPLATES_DIR = ROOT / "templates"
+PAGE_TEMPLATES = frozenset({"post.html", "listing.html"})
+RENDER_TEMPLATES = ("post.html", "stream_item.html", "hero.html", "related_item.html", "listing.html", "redirect.html")
+LISTING_PAGE_SIZE = 12
+SIDEBAR_TAG_COUNT = 5
+RELATED_ENGINES = ("tags", "similar")
+# One-permutation MinHash: each term hashes into one of SIMILARITY_BINS bins
+# and LSH buckets posts by bands of SIMILARITY_BAND_ROWS bins.
+SIMILARITY_BINS = 64
+SIMILARITY_BAND_ROWS = 2
+SIMILARITY_MIN_SCORE = 0.05
+# Buckets shared by more posts than this only reflect common words.
+SIMILARITY_BUCKET_LIMIT = 100
+SIGNATURE_VERSION = 1
+SIGNATURE_EMPTY = 2**64 - 1
+INDEX_STREAM_SIZE = 5
+# Directories between posts/ and a post page: "dated" shards them by month
+# (posts/YYYY/MM/slug.html) so no directory holds the whole archive.
+POST_LAYOUT_DEPTHS = {"flat": 0, "dated": 2}
+MANIFEST_PATH = ROOT / "data" / "build-manifest.json"
+MANIFEST_VERSION = 1
+STORE_PATH = ROOT / "data" / "posts.sqlite3"
+STORE_SCHEMA_VERSION = 2
+# SQL that upgrades the store from the version in the key to the next one.
+# The store is the only copy of published posts, so a version without an
+# entry here is an error rather than a reason to start over.
+STORE_MIGRATIONS: dict[int, tuple[str, ...]] = {
+    # Version 1 stores may still hold the caches that now live in CACHE_PATH.
+    1: ("DROP TABLE IF EXISTS fragments", "DROP TABLE IF EXISTS signatures"),
+}
+# Regenerable build data (rendered cards, similarity signatures), kept out of
+# the post store so the record of truth only ever holds posts.
+CACHE_PATH = ROOT / "data" / "build-cache.sqlite3"
+CACHE_SCHEMA_VERSION = 1
+SEARCH_DIR = ROOT / "data" / "search"
+SEARCH_INDEX_VERSION = 3
+SEARCH_PREFIX_LENGTH = 2
+# Result records per data/search/docs-N.json file; a page of results only
+# fetches the files holding the records it shows.
+SEARCH_DOCS_PER_SHARD = 200
+SEARCH_FIELD_WEIGHTS = {"title": 8, "tags": 6, "summary": 3, "body": 1}
+SEARCH_STOPWORDS = frozenset(
+    """
+    al and como con de del el en era es esta este esto fue ha han la las le lo los mas me mi muy ni no nos
+    of para pero por que se si sin sobre son su sus the to tu un una uno y ya
+    """.split()
+)
+ASSETS_DIR = ROOT / "assets"
+ASSET_DIST_DIR = ASSETS_DIR / "dist"
+ASSET_KINDS = ("css", "js")
+ASSET_HASH_LENGTH = 8
+# Matches plain (assets/css/style.css) and fingerprinted
+# (assets/dist/css/style.0123abcd.css) references alike, but only relative
+# ones: the whole attribute value or url(), optionally behind ../ segments.
+# Absolute paths and URLs on other hosts that happen to contain assets/css/
+# are left alone.
+ASSET_URL_PATTERN = re.compile(
+    r"(?:^|(?<=[\"'(=\s]))(?P<prefix>(?:\.\./)*)assets/(?:dist/)?(?P<kind>css|js)/"
+    r"(?P<name>[\w.-]+?)(?:\.[0-9a-f]{8})?\.(?P<ext>css|js)(?=[\"')?#\s]|$)"
+)
+IMAGE_DIST_DIR = ASSET_DIST_DIR / "img"
+# With --critical-css the rules of this sheet a page uses are inlined and the
+# sheet itself, like the hosts below, loads without blocking rendering.
+CRITICAL_STYLESHEET = "css/style.css"
+DEFERRED_STYLESHEET_HOSTS = ("https://fonts.googleapis.com/",)
+# A copy of the bootstrap-icons package's font/ directory (scripts/fetch_icons.py
+# downloads it); with --icon-subset the build serves a subset of it instead of
+# the CDN stylesheet. Both are pinned to the same release.
+ICONS_VERSION = "1.11.3"
+ICONS_VENDOR_DIR = ASSETS_DIR / "vendor" / "bootstrap-icons"
+ICON_DIST_DIR = ASSET_DIST_DIR / "icons"
+ICONS_CDN_URL = f"https://cdn.jsdelivr.net/npm/bootstrap-icons@{ICONS_VERSION}/font/bootstrap-icons.min.css"
+IMAGE_WIDTHS = (360, 720, 1080)
+IMAGE_SAVE_OPTIONS = {
+    "PNG": {"optimize": True},
+    "JPEG": {"quality": 82, "optimize": True, "progressive": True},
+    "WEBP": {"quality": 80},
+}
+SITE_URL = "https://tepokato.github.io/Anxina/"
+SITE_TITLE = "ANXiNA"
+SITE_DESCRIPTION = "Noticias de tecnología, ciencia y videojuegos con señal clara."
+SITE_LANGUAGE = "es"
+# Post times carry no zone; feeds and sitemaps state them in this one.
+SITE_TIMEZONE = dt.timezone.utc
+FEED_SIZE = 20
+FEED_FILES = {"rss": "feed.xml", "atom": "atom.xml", "json": "feed.json"}
+SITEMAP_URL_LIMIT = 50_000
+# Hand-written pages that should not be indexed.
+SITEMAP_EXCLUDED_PAGES = frozenset({"404.html", "search.html"})
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".xml")
+COMPRESSED_SUFFIXES = (".gz", ".br")
+# ``sizes`` per placement, following the column widths in style.css.
+THUMB_SIZES = "(max-width: 720px) 92vw, 360px"
+HERO_SIZES = "(max-width: 960px) 92vw, 640px"
+FEATURED_SIZES = "(max-width: 1100px) 92vw, 1000px"
+
+
+def set_root(root: Path) -> None:
+    """Point every site path at another tree, e.g. a synthetic benchmark site."""
+    global ROOT, POSTS_DIR, INDEX_PATH, PAGES_DIR, AUTHORS_PATH, TEMPLATES_DIR
+    global MANIFEST_PATH, STORE_PATH, CACHE_PATH, SEARCH_DIR, ASSETS_DIR, ASSET_DIST_DIR, IMAGE_DIST_DIR
+    global ICONS_VENDOR_DIR, ICON_DIST_DIR
+    ROOT = root.resolve()
+    POSTS_DIR = ROOT / "posts"
+    INDEX_PATH = ROOT / "index.html"
+    PAGES_DIR = ROOT / "pages"
+    AUTHORS_PATH = ROOT / "data" / "authors.json"
+    TEMPLATES_DIR = ROOT / "templates"
+    MANIFEST_PATH = ROOT / "data" / "build-manifest.json"
+    STORE_PATH = ROOT / "data" / "posts.sqlite3"
+    CACHE_PATH = ROOT / "data" / "build-cache.sqlite3"
+    SEARCH_DIR = ROOT / "data" / "search"
+    ASSETS_DIR = ROOT / "assets"
+    ASSET_DIST_DIR = ASSETS_DIR / "dist"
+    IMAGE_DIST_DIR = ASSET_DIST_DIR / "img"
+    ICONS_VENDOR_DIR = ASSETS_DIR / "vendor" / "bootstrap-icons"
+    ICON_DIST_DIR = ASSET_DIST_DIR / "icons"
+    get_template.cache_clear()
+
 
 FIELD_LABELS = {
     "Title:": "title",
@@ -31,7 +189,39 @@ FIELD_LABELS = {
 }
 
 
-@dataclasses.dataclass
+def normalize_body(text: str) -> str:
+    return "\n".join(text.splitlines()).strip()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SourceBody:
+    """A post body left in its source file, as byte ranges of body lines."""
+
+    path: Path
+    ranges: tuple[tuple[int, int], ...]
+
+    def read(self) -> str:
+        chunks: list[bytes] = []
+        with self.path.open("rb") as handle:
+            for start, end in self.ranges:
+                handle.seek(start)
+                chunks.append(handle.read(end - start))
+        return normalize_body(b"".join(chunks).decode("utf-8"))
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class StoredBody:
+    """A post body kept in the post store, fetched by slug."""
+
+    path: Path
+    slug: str
+
+    def read(self) -> str:
+        row = store_connection(self.path).execute("SELECT body FROM posts WHERE slug = ?", (self.slug,)).fetchone()
+        return row[0] if row else ""
+
+
+@dataclasses.dataclass(slots=True)
 class Post:
     title: str
     body: str
@@ -47,13 +237,29 @@ class Post:
     status: str
     notes: str
     source_path: Path
+    source_hash: str = ""
+    body_ref: SourceBody | StoredBody | None = dataclasses.field(default=None, repr=False, compare=False)
+    published_at: dt.datetime = dataclasses.field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Tags, categories, authors and statuses repeat across the corpus;
+        # interning keeps one copy of each and makes comparisons cheap.
+        self.tags = [sys.intern(tag) for tag in self.tags]
+        self.author = sys.intern(self.author)
+        self.category = sys.intern(self.category)
+        self.status = sys.intern(self.status)
+        self.published_at = dt.datetime.strptime(f"{self.date} {self.time}", "%Y-%m-%d %H:%M")
 
     @property
     def datetime(self) -> dt.datetime:
-        return dt.datetime.strptime(f"{self.date} {self.time}", "%Y-%m-%d %H:%M")
+        return self.published_at
 
+    def load_body(self) -> str:
+        """The body text; header-only posts read it from ``body_ref`` on each call."""
+        return self.body if self.body_ref is None else self.body_ref.read()
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(slots=True)
 class Author:
     key: str
     name: str
@@ -62,238 +268,152 @@ class Author:
     image: str
     image_alt: str
 
-
-HTML_TEMPLATE = """<!DOCTYPE html>
-<html lang="es">
-<head>
-  <meta charset="UTF-8" />
-  <meta name="viewport" content="width=device-width, initial-scale=1" />
-  <title>ANXiNA · {title}</title>
-  <meta name="description" content="{description}" />
-  <link rel="canonical" href="{canonical_url}" />
-  <meta property="og:site_name" content="ANXiNA" />
-  <meta property="og:title" content="{og_title}" />
-  <meta property="og:description" content="{og_description}" />
-  <meta property="og:type" content="article" />
-  <meta property="og:url" content="{og_url}" />
-  <meta property="og:image" content="{og_image}" />
-  <meta property="og:image:alt" content="{og_image_alt}" />
-  <meta property="article:published_time" content="{published_time}" />
-  <meta property="article:modified_time" content="{published_time}" />
-  <meta property="article:author" content="{article_author}" />
-  <meta name="twitter:card" content="summary_large_image" />
-  <meta name="twitter:title" content="{og_title}" />
-  <meta name="twitter:description" content="{og_description}" />
-  <meta name="twitter:image" content="{og_image}" />
-  <meta name="twitter:image:alt" content="{og_image_alt}" />
-  <meta name="theme-color" content="#f6efe6" />
-  <link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=IBM+Plex+Sans:wght@400;500;600;700&display=swap" />
-  <link rel="stylesheet" href="../assets/css/style.css" />
-  <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@latest/font/bootstrap-icons.min.css" />
-  <script type="application/ld+json">
-{json_ld}
-  </script>
-</head>
-<body>
-  <a class="skip-link" href="#contenido">Saltar al contenido</a>
-  <header class="site-header">
-    <div class="container">
-      <div class="header-top">
-        <div class="header-top__main">
-          <div class="brand">
-            <a class="brand__link" href="../index.html">
-              <div class="brand__badge">
-                <h1 class="brand__title">ANXiNA</h1>
-              </div>
-            </a>
-          </div>
-          <nav class="nav-inline" aria-label="Navegación principal">
-            <a href="../index.html">Inicio</a>
-            <a href="../pages/search.html">Buscar</a>
-          </nav>
-        </div>
-      </div>
-      <div class="header-meta">
-        <details class="nav-menu">
-          <summary><i class="bi bi-list" aria-hidden="true"></i><span>Menú</span></summary>
-          <nav class="nav-menu__panel" aria-label="Navegación principal">
-            <a href="../index.html">Inicio</a>
-            <a href="../pages/search.html">Buscar</a>
-          </nav>
-        </details>
-        <button class="theme-toggle theme-toggle--fixed" type="button" aria-pressed="false" aria-label="Activar tema claro">
-          <i class="theme-toggle__icon bi bi-moon-fill" aria-hidden="true"></i>
-          <span class="theme-toggle__switch" aria-hidden="true"></span>
-        </button>
-      </div>
-    </div>
-  </header>
-
-  <main id="contenido" class="page">
-    <div class="container">
-      <article class="post">
-        <div class="badge">Análisis · {category}</div>
-        <h1>{title}</h1>
-        <div class="post__meta">
-          <span>{date} · {time}</span>
-          <span>{author}</span>
-        </div>
-        <img src="{featured_image}" alt="{featured_image_alt}" style="width: 100%; border-radius: 12px;" />
-{body}
-        <div class="post__tags">
-{tags}
-        </div>
-{author_card}
-      </article>
-{related_section}
-    </div>
-  </main>
-
-
-  <button class="back-to-top" type="button" aria-label="Volver al inicio">
-    <i class="bi bi-arrow-up" aria-hidden="true"></i>
-  </button>
-
-  <footer class="footer">
-    <div class="container footer__content">
-      <div class="footer__column">
-        <h2 class="footer__title">ANXiNA</h2>
-        <p class="footer__text">Tecnología con criterio para entender lo esencial, filtrar el ruido y compartir ideas que impulsen a la comunidad.</p>
-      </div>
-      <div class="footer__column">
-        <h2 class="footer__title">Conecta</h2>
-        <ul class="footer__list">
-          <li><a href="#">Instagram</a></li>
-          <li><a href="#">X / Twitter</a></li>
-          <li><a href="#">LinkedIn</a></li>
-        </ul>
-      </div>
-      <div class="footer__column">
-        <h2 class="footer__title">Legal</h2>
-        <ul class="footer__list">
-          <li><a href="../pages/politica_de_privacidad.html">Política de privacidad</a></li>
-          <li><a href="../pages/terminos_de_servicio.html">Términos</a></li>
-          <li><a href="../pages/contactanos.html">Contáctanos</a></li>
-        </ul>
-      </div>
-    </div>
-  </footer>
-  <script src="../assets/js/theme-toggle.js"></script>
-  <script src="../assets/js/nav-menu.js"></script>
-  <script src="../assets/js/back-to-top.js"></script>
-</body>
-</html>
-"""
-
-
-STREAM_ITEM_TEMPLATE = """        <article class="post post--compact">
-          <a href="posts/{slug}.html">
-            <img class="post__thumb" src="{image}" alt="{alt}" />
-          </a>
-          <div class="post__body">
-            <h4>
-              <a class="post__title-link" href="posts/{slug}.html">{title}</a>
-            </h4>
-            <div class="post__meta">
-              <span>{date}</span>
-              <span>{author} · {category}</span>
-            </div>
-            <p>{summary}</p>
-            <div class="post__tags">
-{tags}
-            </div>
-            <div class="post__actions">
-              <a class="button" href="posts/{slug}.html">Leer artículo</a>
-            </div>
-          </div>
-        </article>"""
-
-HERO_TEMPLATE = """        <h3 class="section-title">En portada</h3>
-        <article class="post post--compact hero__card hero__card--feature">
-          <a href="posts/{slug}.html">
-            <img class="post__thumb hero__thumb" src="{image}" alt="{alt}" />
-          </a>
-          <div class="post__body hero__content">
-            <h2>
-              <a class="post__title-link" href="posts/{slug}.html">{title}</a>
-            </h2>
-            <div class="post__meta">
-              <span>{date}</span>
-              <span>{author} · {category}</span>
-            </div>
-            <p>{summary}</p>
-            <div class="post__tags">
-{tags}
-            </div>
-            <div class="post__actions">
-              <a class="button" href="posts/{slug}.html">Leer artículo</a>
-            </div>
-          </div>
-        </article>"""
-
-
-RELATED_ITEM_TEMPLATE = """          <article class="post post--compact">
-            <a href="{slug}.html">
-              <img class="post__thumb" src="{image}" alt="{alt}" />
-            </a>
-            <div class="post__body">
-              <h3>
-                <a class="post__title-link" href="{slug}.html">{title}</a>
-              </h3>
-              <div class="post__meta">
-                <span>{date}</span>
-                <span>{author} · {category}</span>
-              </div>
-              <div class="post__tags">
-{tags}
-              </div>
-            </div>
-          </article>"""
-
-
-def parse_post(path: Path) -> Post:
-    content = path.read_text(encoding="utf-8")
-    lines = content.splitlines()
+    def __post_init__(self) -> None:
+        self.key = sys.intern(self.key)
+
+
+class Template:
+    """A template compiled once into static chunks and field slots.
+
+    ``{name}`` slots are HTML-escaped on render and ``{name|safe}`` slots are
+    inserted verbatim, so callers pass raw values and pre-rendered fragments.
+    Rendering joins the precompiled static chunks (the page chrome) with the
+    field values in a single ``str.join``.
+    """
+
+    FIELD_PATTERN = re.compile(r"\{(\w+)(\|safe)?\}")
+
+    def __init__(self, source: str, name: str = "<string>") -> None:
+        self.source = source
+        self.name = name
+        self.chunks: list[str] = []
+        self.slots: list[tuple[str, bool]] = []
+        position = 0
+        for match in self.FIELD_PATTERN.finditer(source):
+            self.chunks.append(source[position : match.start()])
+            self.slots.append((match.group(1), match.group(2) is None))
+            position = match.end()
+        self.chunks.append(source[position:])
+        self.escaped_fields = frozenset(field for field, escape in self.slots if escape)
+
+    def render(self, **context: str) -> str:
+        try:
+            values = {
+                field: html.escape(value) if field in self.escaped_fields else value
+                for field, value in context.items()
+            }
+            parts = [self.chunks[0]]
+            for (field, _), chunk in zip(self.slots, self.chunks[1:]):
+                parts.append(values[field])
+                parts.append(chunk)
+        except KeyError as exc:
+            raise KeyError(f"{self.name}: missing template field {exc}") from None
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(name: str) -> Template:
+    """Load and compile ``templates/<name>``.
+
+    Fragment templates (everything but full pages) drop the file's trailing
+    newline so they can be joined like the other generated fragments.
+    """
+    source = (TEMPLATES_DIR / name).read_text(encoding="utf-8")
+    if name not in PAGE_TEMPLATES and source.endswith("\n"):
+        source = source[:-1]
+    return Template(source, name)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_json(value: object) -> str:
+    return hash_bytes(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+
+def parse_post(path: Path, lazy_body: bool = False) -> Post:
+    """Parse a ``FIELD_LABELS`` source file.
+
+    With ``lazy_body`` the body lines are only hashed, not kept: the post
+    records their byte ranges and ``Post.load_body`` reads them when needed,
+    so scanning a large archive only holds the header fields in memory.
+    A file that cannot be read as a post (a half-saved one, say) raises
+    ``BuildError`` naming it.
+    """
     data: dict[str, list[str]] = {key: [] for key in FIELD_LABELS.values()}
+    body_ranges: list[tuple[int, int]] = []
     current_key: str | None = None
-
-    for line in lines:
-        line_stripped = line.strip()
-        if line_stripped in FIELD_LABELS:
-            current_key = FIELD_LABELS[line_stripped]
-            continue
-
-        if current_key:
-            data[current_key].append(line)
+    digest = hashlib.sha256()
+    offset = 0
+
+    with path.open("rb") as handle:
+        for raw_line in handle:
+            digest.update(raw_line)
+            start = offset
+            offset += len(raw_line)
+            try:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+            except UnicodeDecodeError as exc:
+                raise BuildError(f"{path.name}: not valid UTF-8 ({exc.reason})") from None
+            line_stripped = line.strip()
+            if line_stripped in FIELD_LABELS:
+                current_key = FIELD_LABELS[line_stripped]
+                continue
+
+            if current_key == "body" and lazy_body:
+                if body_ranges and body_ranges[-1][1] == start:
+                    body_ranges[-1] = (body_ranges[-1][0], offset)
+                else:
+                    body_ranges.append((start, offset))
+            elif current_key:
+                data[current_key].append(line)
 
     def join_field(key: str) -> str:
         return "\n".join(data[key]).strip()
 
     tags = [tag.strip() for tag in join_field("tags").split(",") if tag.strip()]
+    if not join_field("slug"):
+        raise BuildError(f"{path.name}: missing slug")
+
+    try:
+        return Post(
+            title=join_field("title"),
+            body="" if lazy_body else join_field("body"),
+            tags=tags,
+            date=join_field("date"),
+            time=join_field("time"),
+            author=join_field("author"),
+            summary=join_field("summary"),
+            featured_image=join_field("featured_image"),
+            featured_image_alt=join_field("featured_image_alt") or f"Imagen destacada de {join_field('title')}",
+            slug=join_field("slug"),
+            category=join_field("category"),
+            status=join_field("status"),
+            notes=join_field("notes"),
+            source_path=path,
+            source_hash=digest.hexdigest(),
+            body_ref=SourceBody(path, tuple(body_ranges)) if lazy_body else None,
+        )
+    except ValueError as exc:
+        # Post checks the date and time; a missing or partial one ends up here.
+        raise BuildError(f"{path.name}: {exc}") from None
+
+
+def render_source(fields: dict[str, str]) -> str:
+    """The source file text for ``fields`` (keyed like ``FIELD_LABELS`` values)."""
+    return "\n".join(f"{label}\n{fields[key]}\n" for label, key in FIELD_LABELS.items())
 
-    return Post(
-        title=join_field("title"),
-        body=join_field("body"),
-        tags=tags,
-        date=join_field("date"),
-        time=join_field("time"),
-        author=join_field("author"),
-        summary=join_field("summary"),
-        featured_image=join_field("featured_image"),
-        featured_image_alt=join_field("featured_image_alt") or f"Imagen destacada de {join_field('title')}",
-        slug=join_field("slug"),
-        category=join_field("category"),
-        status=join_field("status"),
-        notes=join_field("notes"),
-        source_path=path,
-    )
-
-
-def load_authors() -> dict[str, Author]:
+
+def load_authors_data() -> dict[str, dict]:
     if not AUTHORS_PATH.exists():
         return {}
+    return json.loads(AUTHORS_PATH.read_text(encoding="utf-8"))
+
 
-    data = json.loads(AUTHORS_PATH.read_text(encoding="utf-8"))
+def load_authors(data: dict[str, dict] | None = None) -> dict[str, Author]:
+    if data is None:
+        data = load_authors_data()
     authors: dict[str, Author] = {}
     for key, details in data.items():
         authors[key] = Author(
@@ -307,12 +427,318 @@ def load_authors() -> dict[str, Author]:
     return authors
 
 
-def normalize_post_image(src: str) -> str:
-    if src.startswith(("http://", "https://", "/", "../")):
+class StoreError(Exception):
+    """Raised when the post store cannot be opened as the current schema."""
+
+
+class PostStore:
+    """SQLite archive of parsed posts, keyed by slug.
+
+    Published sources are deleted after a build, so the store is the record
+    of truth for them: every build upserts the posts parsed from ``posts/*.txt``
+    and then loads the whole corpus from here. A source file stands for one
+    post, so a source that comes back under another slug replaces the row it
+    wrote before; ``remove`` is the only way to drop a published post.
+    """
+
+    COLUMNS = (
+        "slug",
+        "title",
+        "body",
+        "tags",
+        "date",
+        "time",
+        "author",
+        "summary",
+        "featured_image",
+        "featured_image_alt",
+        "category",
+        "status",
+        "notes",
+        "source_name",
+        "source_hash",
+    )
+
+    def __init__(self, path: Path | None = None) -> None:
+        path = path or STORE_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # The store is committed with the site: opening a current one must not
+        # write to it, or every build would leave the file modified.
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == STORE_SCHEMA_VERSION:
+            return
+        existing = self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts'")
+        if existing.fetchone():
+            self.migrate(version)
+            return
+        columns = ", ".join(f"{column} TEXT NOT NULL" for column in self.COLUMNS[1:])
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE posts (slug TEXT PRIMARY KEY, {columns})")
+            self.connection.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+
+    def migrate(self, version: int) -> None:
+        """Upgrade the store from ``version`` one ``STORE_MIGRATIONS`` step at a time."""
+        while version != STORE_SCHEMA_VERSION:
+            statements = STORE_MIGRATIONS.get(version)
+            if statements is None:
+                self.close()
+                raise StoreError(
+                    f"{self.path} uses store schema version {version} and this build expects "
+                    f"{STORE_SCHEMA_VERSION}; migrate it (see STORE_MIGRATIONS) before building."
+                )
+            with self.connection:
+                for statement in statements:
+                    self.connection.execute(statement)
+                version += 1
+                self.connection.execute(f"PRAGMA user_version = {version}")
+
+    def __enter__(self) -> PostStore:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def upsert(self, posts: Iterable[Post]) -> None:
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        rows = [
+            (
+                post.slug,
+                post.title,
+                post.load_body(),
+                json.dumps(post.tags, ensure_ascii=False),
+                post.date,
+                post.time,
+                post.author,
+                post.summary,
+                post.featured_image,
+                post.featured_image_alt,
+                post.category,
+                post.status,
+                post.notes,
+                post.source_path.name,
+                post.source_hash,
+            )
+            for post in posts
+        ]
+        if not rows:
+            return
+        with self.connection:
+            source = self.COLUMNS.index("source_name")
+            self.connection.executemany(
+                "DELETE FROM posts WHERE source_name = ? AND slug != ?", ((row[source], row[0]) for row in rows)
+            )
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO posts ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                rows,
+            )
+
+    def prune_drafts(self, source_slugs: set[str]) -> None:
+        """Forget drafts whose source file is gone; published posts are kept."""
+        stored = self.connection.execute("SELECT slug FROM posts WHERE lower(status) != 'published'")
+        stale = [(slug,) for (slug,) in stored if slug not in source_slugs]
+        if not stale:
+            return
+        with self.connection:
+            self.connection.executemany("DELETE FROM posts WHERE slug = ?", stale)
+
+    def remove(self, slugs: Iterable[str]) -> None:
+        """Forget the posts ``slugs``, published or not."""
+        with self.connection:
+            self.connection.executemany("DELETE FROM posts WHERE slug = ?", ((slug,) for slug in slugs))
+
+    def source_hashes(self) -> dict[str, str]:
+        return dict(self.connection.execute("SELECT slug, source_hash FROM posts"))
+
+    def load_all(self) -> list[Post]:
+        """Load every post's header fields; bodies are read on demand."""
+        columns = [column for column in self.COLUMNS if column != "body"]
+        cursor = self.connection.execute(f"SELECT {', '.join(columns)} FROM posts ORDER BY slug")
+        return [self._row_to_post(dict(zip(columns, row))) for row in cursor]
+
+    def _row_to_post(self, record: dict[str, str]) -> Post:
+        return Post(
+            title=record["title"],
+            body="",
+            tags=json.loads(record["tags"]),
+            date=record["date"],
+            time=record["time"],
+            author=record["author"],
+            summary=record["summary"],
+            featured_image=record["featured_image"],
+            featured_image_alt=record["featured_image_alt"],
+            slug=record["slug"],
+            category=record["category"],
+            status=record["status"],
+            notes=record["notes"],
+            source_path=POSTS_DIR / record["source_name"],
+            source_hash=record["source_hash"],
+            body_ref=StoredBody(self.path, record["slug"]),
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _store_connection(path: Path, pid: int) -> sqlite3.Connection:
+    return sqlite3.connect(path)
+
+
+def store_connection(path: Path) -> sqlite3.Connection:
+    """A read connection to the store, one per process (never shared across a fork)."""
+    return _store_connection(path, os.getpid())
+
+
+def open_build_cache(path: Path | None = None) -> sqlite3.Connection:
+    """Open the SQLite file of regenerable build data at ``CACHE_PATH``.
+
+    Everything in it can be rebuilt from the posts, so unlike the post store
+    it is simply emptied when its schema version changes.
+    """
+    path = path or CACHE_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path)
+    if connection.execute("PRAGMA user_version").fetchone()[0] != CACHE_SCHEMA_VERSION:
+        connection.execute("DROP TABLE IF EXISTS fragments")
+        connection.execute("DROP TABLE IF EXISTS signatures")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS fragments "
+        "(slug TEXT NOT NULL, variant TEXT NOT NULL, key TEXT NOT NULL, html TEXT NOT NULL, "
+        "PRIMARY KEY (slug, variant))"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS signatures (slug TEXT PRIMARY KEY, key TEXT NOT NULL, signature BLOB NOT NULL)"
+    )
+    connection.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+    connection.commit()
+    return connection
+
+
+def prune_build_cache(connection: sqlite3.Connection, table: str, slugs: set[str]) -> None:
+    """Delete the rows of ``table`` whose post is not in ``slugs``."""
+    stale = [row for row in connection.execute(f"SELECT DISTINCT slug FROM {table}") if row[0] not in slugs]
+    connection.executemany(f"DELETE FROM {table} WHERE slug = ?", stale)
+
+
+class FragmentCache:
+    """Post cards rendered once per build and persisted in the build cache.
+
+    A card is reused while its key (the renderer fingerprint, the card
+    variant, the post's content hash and its featured image entry) is
+    unchanged, so a post listed as related by many others is rendered once
+    per build, and not at all by later builds that do not touch it.
+    """
+
+    def __init__(self, renderer: str, path: Path | None = None) -> None:
+        self.renderer = renderer
+        self.connection = open_build_cache(path)
+        self.cards: dict[tuple[str, str], str] = {}
+        self.pending: list[tuple[str, str, str, str]] = []
+        self.hits = 0
+
+    def card(self, post: Post, variant: str, images: dict[str, dict], render: Callable[[], str]) -> str:
+        cached = self.cards.get((post.slug, variant))
+        if cached is not None:
+            self.hits += 1
+            return cached
+        image = images.get(normalize_index_image(post.featured_image))
+        key = hash_json([self.renderer, variant, post.source_hash, image])
+        row = self.connection.execute(
+            "SELECT key, html FROM fragments WHERE slug = ? AND variant = ?", (post.slug, variant)
+        ).fetchone()
+        if row and row[0] == key:
+            self.hits += 1
+            card = row[1]
+        else:
+            card = render()
+            self.pending.append((post.slug, variant, key, card))
+        self.cards[(post.slug, variant)] = card
+        return card
+
+    def save(self, slugs: set[str]) -> None:
+        """Persist the cards rendered by this build and forget posts not in ``slugs``."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO fragments (slug, variant, key, html) VALUES (?, ?, ?, ?)", self.pending
+            )
+            prune_build_cache(self.connection, "fragments", slugs)
+        self.connection.close()
+        self.pending = []
+
+
+def post_path(post: Post, layout: str = "flat") -> str:
+    """Where ``post``'s page lives relative to ``posts/``."""
+    if layout == "dated":
+        return f"{post.date[:4]}/{post.date[5:7]}/{post.slug}.html"
+    return f"{post.slug}.html"
+
+
+def post_root(layout: str = "flat") -> str:
+    """The relative path from a post page back to the site root."""
+    return "../" * (POST_LAYOUT_DEPTHS[layout] + 1)
+
+
+def remove_post_page(path: Path) -> None:
+    """Delete a post page, its compressed copies and month directories left empty."""
+    for suffix in ("", *COMPRESSED_SUFFIXES):
+        path.with_name(f"{path.name}{suffix}").unlink(missing_ok=True)
+    for parent in path.parents:
+        if parent == POSTS_DIR or any(parent.iterdir()):
+            break
+        parent.rmdir()
+
+
+def redirect_stubs(posts: Iterable[Post], layout: str, manifest: dict) -> dict[str, Post]:
+    """The flat page names, with their posts, that need a stub in ``layout``.
+
+    Only URLs that were actually served flat get one: a post whose last
+    recorded page was flat, whose flat page is still on disk, or that already
+    has a stub. Posts first published under another layout never had a flat
+    URL and get none. Call this before the manifest takes the new pages.
+    """
+    if layout == "flat":
+        return {}
+    previous_posts = manifest.get("posts", {})
+    previous_stubs = set(manifest.get("redirects", {}).get("paths", ()))
+    stubs: dict[str, Post] = {}
+    for post in posts:
+        name = f"{post.slug}.html"
+        path = previous_posts.get(post.slug, {}).get("path")
+        if name in previous_stubs or path == name or (POSTS_DIR / name).exists():
+            stubs[name] = post
+    return stubs
+
+
+def write_redirect_stubs(stubs: dict[str, Post], layout: str, manifest: dict, renderer: str, pages: set[str]) -> int:
+    """Write a stub page at the flat URL of each post in ``stubs``; return how many were checked.
+
+    GitHub Pages has no server-side redirects, so each stub sends visitors on
+    with a meta refresh and search engines with a canonical link. Stubs of
+    earlier builds are removed unless a post page (``pages``) now has that name.
+    """
+    key = hash_json([renderer, [(name, post.title, post.date) for name, post in sorted(stubs.items())]])
+    previous = manifest.get("redirects", {})
+    if previous.get("key") == key:
+        return 0
+    for name in set(previous.get("paths", ())) - stubs.keys() - pages:
+        remove_post_page(POSTS_DIR / name)
+    for name, post in stubs.items():
+        text = get_template("redirect.html").render(title=post.title, url=post_path(post, layout))
+        write_text_if_changed(POSTS_DIR / name, text)
+    manifest["redirects"] = {"key": key, "paths": sorted(stubs)}
+    return len(stubs)
+
+
+def normalize_post_image(src: str, root: str = "../") -> str:
+    if src.startswith(("http://", "https://", "/")):
         return src
+    if src.startswith("../"):
+        return f"{root}{src[3:]}"
     if src.startswith("assets/"):
-        return f"../{src}"
-    return f"../assets/img/{src}"
+        return f"{root}{src}"
+    return f"{root}assets/img/{src}"
 
 
 def normalize_index_image(src: str) -> str:
@@ -325,6 +751,69 @@ def normalize_index_image(src: str) -> str:
     return f"assets/img/{src}"
 
 
+def image_dimensions(data: bytes) -> tuple[int, int] | None:
+    """Read the pixel size from a PNG, GIF or JPEG header without Pillow."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and data[12:16] == b"IHDR":
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return int.from_bytes(data[6:8], "little"), int.from_bytes(data[8:10], "little")
+    if data.startswith(b"\xff\xd8"):
+        position = 2
+        while position + 9 < len(data):
+            if data[position] != 0xFF:
+                return None
+            marker = data[position + 1]
+            # SOF0-SOF15 carry the frame size; C4, C8 and CC are other tables.
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height = int.from_bytes(data[position + 5 : position + 7], "big")
+                return int.from_bytes(data[position + 7 : position + 9], "big"), height
+            position += 2 + int.from_bytes(data[position + 2 : position + 4], "big")
+    return None
+
+
+def image_srcset(src: str, images: dict[str, dict], base: str) -> str:
+    """The ``srcset`` candidates of ``src``, or "" when it has no resized variants."""
+    info = images.get(src)
+    if not info or not info["variants"]:
+        return ""
+    candidates = [f"{base}{path} {width}w" for path, width in info["variants"]]
+    candidates.append(f"{base}{src} {info['width']}w")
+    return ", ".join(candidates)
+
+
+def image_attributes(src: str, images: dict[str, dict], base: str, sizes: str) -> str:
+    """``srcset``, ``sizes``, ``width`` and ``height`` for an ``<img>`` of ``src``.
+
+    ``src`` is the root-relative path from ``normalize_index_image`` and
+    ``base`` the prefix that reaches the site root from the page.
+    """
+    info = images.get(src)
+    if not info:
+        return ""
+    attributes = ""
+    srcset = image_srcset(src, images, base)
+    if srcset:
+        attributes = f' srcset="{html.escape(srcset)}" sizes="{sizes}"'
+    return f'{attributes} width="{info["width"]}" height="{info["height"]}"'
+
+
+def image_preload(url: str, src: str, images: dict[str, dict], base: str, sizes: str) -> str:
+    """A high-priority ``<link rel="preload">`` for the image a page shows first.
+
+    ``url`` is what the ``<img>`` loads; with ``imagesrcset`` the browser
+    picks the same candidate the ``<img>`` will, so nothing is fetched twice.
+    """
+    srcset = image_srcset(src, images, base)
+    attributes = f' imagesrcset="{html.escape(srcset)}" imagesizes="{sizes}"' if srcset else ""
+    return f'  <link rel="preload" href="{html.escape(url)}" as="image"{attributes} fetchpriority="high" />'
+
+
+def post_images(posts: Iterable[Post], images: dict[str, dict]) -> dict[str, dict]:
+    """The entries of ``images`` that the featured images of ``posts`` use."""
+    sources = (normalize_index_image(post.featured_image) for post in posts)
+    return {src: images[src] for src in sources if src in images}
+
+
 def format_tags(tags: Iterable[str], limit: int | None = None, indent: str = "          ") -> str:
     normalized: list[str] = []
     for tag in tags:
@@ -344,79 +833,216 @@ def normalize_tag(tag: str) -> str:
     return tag.strip().lower().replace(" ", "")
 
 
-def render_body_markdown(text: str) -> str:
-    lines = text.splitlines()
-    html_lines: list[str] = []
+def normalized_tag_set(tags: Iterable[str]) -> set[str]:
+    return {normalize_tag(tag) for tag in tags if tag.strip()}
+
+
+HEADING_PATTERN = re.compile(r"(#{1,3})\s+(.*)")
+UNORDERED_ITEM_PATTERN = re.compile(r"[-*]\s+(.*)")
+ORDERED_ITEM_PATTERN = re.compile(r"\d{1,9}[.)]\s+(.*)")
+FENCE_PATTERN = re.compile(r"(`{3,}|~{3,})\s*([\w+-]*)")
+# The lookahead lets the scan skip straight to characters that can open a span
+# instead of trying every alternative at every position.
+INLINE_PATTERN = re.compile(
+    r"(?=[`!\[*_])(?:"
+    r"`(?P<code>[^`]+)`"
+    r"|!\[(?P<image_alt>[^\[\]]*)\]\((?P<image_src>[^()\s]+)\)"
+    r"|\[(?P<link_text>[^\[\]]+)\]\((?P<link_href>[^()\s]+)\)"
+    r"|\*\*(?P<strong>[^*]+)\*\*"
+    r"|(?<!\w)__(?P<strong_alt>[^_]+)__(?!\w)"
+    r"|\*(?P<em>[^*\s](?:[^*]*[^*\s])?)\*"
+    r"|(?<!\w)_(?P<em_alt>[^_\s](?:[^_]*[^_\s])?)_(?!\w)"
+    r")"
+)
+UNSAFE_URL_PATTERN = re.compile(r"\s*(?:javascript|vbscript|data):", re.IGNORECASE)
+
+
+def safe_url(url: str) -> str:
+    return "#" if UNSAFE_URL_PATTERN.match(url) else url
+
+
+def render_inline(text: str) -> str:
+    """Escape ``text`` and render inline code, images, links and emphasis.
+
+    The text is escaped once up front: escaping never produces or removes a
+    Markdown delimiter, so the scan sees the same structure either way.
+    """
+    escaped = html.escape(text)
+    # Substring tests run in C; a set test would hash every character.
+    if "`" not in text and "*" not in text and "_" not in text and "[" not in text:
+        return escaped
+    return render_escaped_inline(escaped)
+
+
+def render_escaped_inline(text: str) -> str:
+    """``render_inline`` for already escaped text.
+
+    One left-to-right scan; every pattern is bounded by its closing delimiter
+    so the work stays linear in the length of the text.
+    """
+    parts: list[str] = []
+    position = 0
+    for match in INLINE_PATTERN.finditer(text):
+        parts.append(text[position : match.start()])
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "code":
+            parts.append(f"<code>{match['code']}</code>")
+        elif kind == "image_src":
+            parts.append(f'<img src="{safe_url(match["image_src"])}" alt="{match["image_alt"]}" />')
+        elif kind == "link_href":
+            parts.append(f'<a href="{safe_url(match["link_href"])}">{render_escaped_inline(match["link_text"])}</a>')
+        elif kind in ("strong", "strong_alt"):
+            parts.append(f"<strong>{render_escaped_inline(match[kind])}</strong>")
+        else:
+            parts.append(f"<em>{render_escaped_inline(match[kind])}</em>")
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def iter_body_markdown(text: str) -> Iterable[str]:
+    """Render a post body one line at a time, yielding HTML lines.
+
+    Supports headings (``#`` to ``###``), ``-``/``*`` and numbered lists,
+    ``>`` blockquotes, fenced code blocks and the inline syntax handled by
+    ``render_inline``. Only the current paragraph or code block is buffered,
+    plus the lines a source line produces, which are yielded before the next
+    one is read (plain appends are cheaper than nested generators).
+    """
+    out: list[str] = []
     paragraph: list[str] = []
-    in_list = False
+    code: list[str] = []
+    code_open = ""
+    fence: str | None = None
+    list_tag: str | None = None
+    in_quote = False
 
     def flush_paragraph() -> None:
-        nonlocal paragraph
         if paragraph:
-            content = " ".join(html.escape(line.strip()) for line in paragraph if line.strip())
-            html_lines.append(f"        <p>{content}</p>")
-            paragraph = []
-
-    def close_list() -> None:
-        nonlocal in_list
-        if in_list:
-            html_lines.append("        </ul>")
-            in_list = False
-
-    for raw_line in lines:
-        line = raw_line.rstrip()
-        stripped = line.strip()
+            indent = "          " if in_quote else "        "
+            out.append(f"{indent}<p>{render_inline(' '.join(paragraph))}</p>")
+            paragraph.clear()
+
+    def close_blocks() -> None:
+        nonlocal list_tag, in_quote
+        flush_paragraph()
+        if list_tag:
+            out.append(f"        </{list_tag}>")
+            list_tag = None
+        if in_quote:
+            out.append("        </blockquote>")
+            in_quote = False
+
+    for raw_line in text.splitlines():
+        if out:
+            yield from out
+            out.clear()
+        if fence is not None:
+            if raw_line.strip().startswith(fence):
+                out.append(code_open + "\n".join(code) + "</code></pre>")
+                code.clear()
+                fence = None
+            else:
+                code.append(html.escape(raw_line.rstrip()))
+            continue
 
+        stripped = raw_line.strip()
         if not stripped:
-            flush_paragraph()
-            close_list()
+            if paragraph or list_tag or in_quote:
+                close_blocks()
+            continue
+
+        first = stripped[0]
+        fence_match = FENCE_PATTERN.fullmatch(stripped) if first in "`~" else None
+        if fence_match:
+            close_blocks()
+            fence = fence_match.group(1)
+            language = fence_match.group(2)
+            class_attr = f' class="language-{html.escape(language)}"' if language else ""
+            code_open = f"        <pre><code{class_attr}>"
             continue
 
-        heading_match = re.match(r"^(#{1,3})\s+(.*)", stripped)
+        heading_match = HEADING_PATTERN.fullmatch(stripped) if first == "#" else None
         if heading_match:
-            flush_paragraph()
-            close_list()
+            close_blocks()
             level = len(heading_match.group(1))
-            content = html.escape(heading_match.group(2))
-            html_lines.append(f"        <h{level}>{content}</h{level}>")
+            out.append(f"        <h{level}>{render_inline(heading_match.group(2))}</h{level}>")
             continue
 
-        if stripped.startswith("- "):
+        if first == ">":
+            if not in_quote:
+                close_blocks()
+                out.append("        <blockquote>")
+                in_quote = True
+            quoted = stripped[1:].strip()
+            if quoted:
+                paragraph.append(quoted)
+            else:
+                flush_paragraph()
+            continue
+
+        item_match = None
+        if first in "-*":
+            item_match = UNORDERED_ITEM_PATTERN.fullmatch(stripped)
+            tag = "ul"
+        elif first.isdigit():
+            item_match = ORDERED_ITEM_PATTERN.fullmatch(stripped)
+            tag = "ol"
+        if item_match:
+            if list_tag != tag:
+                close_blocks()
+                out.append(f"        <{tag}>")
+                list_tag = tag
             flush_paragraph()
-            if not in_list:
-                html_lines.append("        <ul>")
-                in_list = True
-            item = html.escape(stripped[2:].strip())
-            html_lines.append(f"          <li>{item}</li>")
+            out.append(f"          <li>{render_inline(item_match.group(1).strip())}</li>")
             continue
 
+        if list_tag or in_quote:
+            close_blocks()
         paragraph.append(stripped)
 
-    flush_paragraph()
-    close_list()
+    if fence is not None:
+        out.append(code_open + "\n".join(code) + "</code></pre>")
+    close_blocks()
+    yield from out
 
-    return "\n".join(html_lines)
+
+def render_body_markdown(text: str) -> str:
+    return "\n".join(iter_body_markdown(text))
+
+
+def render_related_item(post: Post, images: dict[str, dict], layout: str = "flat") -> str:
+    root = post_root(layout)
+    return get_template("related_item.html").render(
+        url="../" * POST_LAYOUT_DEPTHS[layout] + post_path(post, layout),
+        image=normalize_post_image(post.featured_image, root),
+        image_attrs=image_attributes(normalize_index_image(post.featured_image), images, root, THUMB_SIZES),
+        alt=post.featured_image_alt,
+        title=post.title,
+        date=post.date,
+        author=post.author,
+        category=post.category,
+        tags=format_tags(post.tags, limit=2, indent="                "),
+    )
 
 
-def render_related_section(related_posts: list[Post]) -> str:
+def render_related_section(
+    related_posts: list[Post],
+    images: dict[str, dict] | None = None,
+    fragments: FragmentCache | None = None,
+    layout: str = "flat",
+) -> str:
     if not related_posts:
         return ""
 
-    items: list[str] = []
-    for post in related_posts:
-        items.append(
-            RELATED_ITEM_TEMPLATE.format(
-                image=html.escape(normalize_post_image(post.featured_image)),
-                alt=html.escape(post.featured_image_alt),
-                title=html.escape(post.title),
-                date=html.escape(post.date),
-                author=html.escape(post.author),
-                category=html.escape(post.category),
-                tags=format_tags(post.tags, limit=2, indent="                "),
-                slug=html.escape(post.slug),
-            )
-        )
-
+    images = images or {}
+    if fragments is None:
+        items = [render_related_item(post, images, layout) for post in related_posts]
+    else:
+        items = [
+            fragments.card(post, "related", images, functools.partial(render_related_item, post, images, layout))
+            for post in related_posts
+        ]
     items_html = "\n".join(items)
     return (
         "\n"
@@ -429,10 +1055,10 @@ def render_related_section(related_posts: list[Post]) -> str:
     )
 
 
-def build_post_json_ld(post: Post, author: Author | None, canonical_url: str) -> str:
+def build_post_json_ld(post: Post, author: Author | None, canonical_url: str, root: str = "../") -> str:
     author_name = author.name if author else post.author
     description = post.summary.strip() or post.title
-    image_url = normalize_post_image(post.featured_image)
+    image_url = normalize_post_image(post.featured_image, root)
     data = {
         "@context": "https://schema.org",
         "@type": "NewsArticle",
@@ -448,45 +1074,69 @@ def build_post_json_ld(post: Post, author: Author | None, canonical_url: str) ->
     return json.dumps(data, ensure_ascii=False, indent=2)
 
 
-def render_post(post: Post, related_posts: list[Post], author: Author | None) -> str:
-    body_html = render_body_markdown(post.body)
+def render_post(
+    post: Post,
+    related_posts: list[Post],
+    author: Author | None,
+    body_html: str | None = None,
+    images: dict[str, dict] | None = None,
+    related_section: str | None = None,
+    layout: str = "flat",
+) -> str:
+    """Render a post page; ``related_section`` may be passed pre-rendered."""
+    images = images or {}
+    root = post_root(layout)
+    if related_section is None:
+        related_section = render_related_section(related_posts, images, layout=layout)
+    if body_html is None:
+        body_html = render_body_markdown(post.load_body())
     tags_html = format_tags(post.tags)
     canonical_url = f"{post.slug}.html"
     description = post.summary.strip() or post.title
-    og_image = normalize_post_image(post.featured_image)
+    og_image = normalize_post_image(post.featured_image, root)
     published_time = post.datetime.isoformat()
     article_author = author.name if author else post.author
-    json_ld = build_post_json_ld(post, author, canonical_url)
-    return HTML_TEMPLATE.format(
-        title=html.escape(post.title),
-        description=html.escape(description),
-        canonical_url=html.escape(canonical_url),
-        og_title=html.escape(post.title),
-        og_description=html.escape(description),
-        og_url=html.escape(canonical_url),
-        og_image=html.escape(og_image),
-        og_image_alt=html.escape(post.featured_image_alt),
-        published_time=html.escape(published_time),
-        article_author=html.escape(article_author),
+    json_ld = build_post_json_ld(post, author, canonical_url, root)
+    return get_template("post.html").render(
+        root=root,
+        title=post.title,
+        description=description,
+        canonical_url=canonical_url,
+        og_title=post.title,
+        og_description=description,
+        og_url=canonical_url,
+        og_image=og_image,
+        og_image_alt=post.featured_image_alt,
+        published_time=published_time,
+        article_author=article_author,
         json_ld=json_ld,
-        category=html.escape(post.category),
-        date=html.escape(post.date),
-        time=html.escape(post.time),
-        author=html.escape(post.author),
-        featured_image=html.escape(normalize_post_image(post.featured_image)),
-        featured_image_alt=html.escape(post.featured_image_alt),
+        category=post.category,
+        date=post.date,
+        time=post.time,
+        author=post.author,
+        featured_image=og_image,
+        featured_image_attrs=image_attributes(
+            normalize_index_image(post.featured_image), images, root, FEATURED_SIZES
+        ),
+        featured_image_preload=image_preload(
+            og_image, normalize_index_image(post.featured_image), images, root, FEATURED_SIZES
+        )
+        if post.featured_image
+        else "",
+        featured_image_priority=' fetchpriority="high"' if post.featured_image else "",
+        featured_image_alt=post.featured_image_alt,
         body=body_html,
         tags=tags_html,
-        author_card=render_author_card(author) if author else "",
-        related_section=render_related_section(related_posts),
+        author_card=render_author_card(author, root) if author else "",
+        related_section=related_section,
     )
 
 
-def render_author_card(author: Author) -> str:
+def render_author_card(author: Author, root: str = "../") -> str:
     if not author:
         return ""
 
-    image = normalize_post_image(author.image) if author.image else ""
+    image = normalize_post_image(author.image, root) if author.image else ""
     image_html = (
         f'        <img class="author-card__avatar" src="{html.escape(image)}" alt="{html.escape(author.image_alt)}" />'
         if image
@@ -515,44 +1165,248 @@ def render_author_card(author: Author) -> str:
     )
 
 
-def render_stream(posts: list[Post]) -> str:
-    items: list[str] = []
-    for post in posts:
-        items.append(
-            STREAM_ITEM_TEMPLATE.format(
-                image=html.escape(normalize_index_image(post.featured_image)),
-                alt=html.escape(post.featured_image_alt),
-                title=html.escape(post.title),
-                date=html.escape(post.date),
-                author=html.escape(post.author),
-                category=html.escape(post.category),
-                summary=html.escape(post.summary),
-                tags=format_tags(post.tags, limit=2, indent="              "),
-                slug=html.escape(post.slug),
-            )
+def render_stream_item(post: Post, base: str, images: dict[str, dict], layout: str = "flat") -> str:
+    src = normalize_index_image(post.featured_image)
+    image = src
+    if base and not image.startswith(("http://", "https://", "/")):
+        image = f"{base}{image}"
+    return get_template("stream_item.html").render(
+        url=f"{base}posts/{post_path(post, layout)}",
+        image=image,
+        image_attrs=image_attributes(src, images, base, THUMB_SIZES),
+        alt=post.featured_image_alt,
+        title=post.title,
+        date=post.date,
+        author=post.author,
+        category=post.category,
+        summary=post.summary,
+        tags=format_tags(post.tags, limit=2, indent="              "),
+    )
+
+
+def render_stream(
+    posts: list[Post],
+    base: str = "",
+    images: dict[str, dict] | None = None,
+    fragments: FragmentCache | None = None,
+    layout: str = "flat",
+) -> str:
+    """Render stream cards for a page living ``base`` away from the site root."""
+    images = images or {}
+    if fragments is None:
+        return "\n".join(render_stream_item(post, base, images, layout) for post in posts)
+    return "\n".join(
+        fragments.card(
+            post, f"stream:{base}", images, functools.partial(render_stream_item, post, base, images, layout)
         )
-    return "\n".join(items)
-
-
-def render_portada(post: Post) -> str:
-    return HERO_TEMPLATE.format(
-        image=html.escape(normalize_index_image(post.featured_image)),
-        alt=html.escape(post.featured_image_alt),
-        title=html.escape(post.title),
-        summary=html.escape(post.summary),
-        date=html.escape(post.date),
-        author=html.escape(post.author),
-        category=html.escape(post.category),
+        for post in posts
+    )
+
+
+def render_portada(post: Post, images: dict[str, dict] | None = None, layout: str = "flat") -> str:
+    image = normalize_index_image(post.featured_image)
+    return get_template("hero.html").render(
+        url=f"posts/{post_path(post, layout)}",
+        image=image,
+        image_attrs=image_attributes(image, images or {}, "", HERO_SIZES),
+        alt=post.featured_image_alt,
+        priority=' fetchpriority="high"' if post.featured_image else "",
+        title=post.title,
+        summary=post.summary,
+        date=post.date,
+        author=post.author,
+        category=post.category,
         tags=format_tags(post.tags, limit=3, indent="              "),
-        slug=html.escape(post.slug),
     )
 
 
+def render_portada_preload(post: Post, images: dict[str, dict] | None = None) -> str:
+    """The hero image preload for ``index.html``, or "" when the post has no image."""
+    if not post.featured_image:
+        return ""
+    image = normalize_index_image(post.featured_image)
+    return image_preload(image, image, images or {}, "", HERO_SIZES)
+
+
+@dataclasses.dataclass
+class Listing:
+    """A paginated list of posts rendered under ``pages/<name>[--N].html``."""
+
+    name: str
+    heading: str
+    intro: str
+    posts: list[Post]
+
+    def page_name(self, page: int) -> str:
+        # slugify collapses runs of hyphens, so "--" can never come from a
+        # category or tag: page 2 of "foo" stays apart from a "foo 2" listing.
+        return f"{self.name}.html" if page == 1 else f"{self.name}--{page}.html"
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.posts) // LISTING_PAGE_SIZE))
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", fold_text(text)).strip("-")
+
+
+def collect_listings(published: list[Post]) -> list[Listing]:
+    """The archive plus one listing per category and per tag, newest first."""
+    listings = [
+        Listing(
+            name="archivo",
+            heading="Archivo",
+            intro="Todas las publicaciones de ANXiNA, de la más reciente a la más antigua.",
+            posts=published,
+        )
+    ]
+    categories: dict[str, tuple[str, list[Post]]] = {}
+    tags: dict[str, tuple[str, list[Post]]] = {}
+    for post in published:
+        category = post.category.strip()
+        if slugify(category):
+            categories.setdefault(slugify(category), (category, []))[1].append(post)
+        for tag in dict.fromkeys(normalize_tag(tag) for tag in post.tags if tag.strip()):
+            if slugify(tag):
+                tags.setdefault(slugify(tag), (tag, []))[1].append(post)
+
+    for slug, (category, posts) in sorted(categories.items()):
+        listings.append(
+            Listing(
+                name=f"categoria-{slug}",
+                heading=f"Categoría: {category}",
+                intro=f"Todo lo publicado en la categoría {category}.",
+                posts=posts,
+            )
+        )
+    for slug, (tag, posts) in sorted(tags.items()):
+        listings.append(
+            Listing(
+                name=f"etiqueta-{slug}",
+                heading=f"#{tag}",
+                intro=f"Publicaciones con la etiqueta #{tag}.",
+                posts=posts,
+            )
+        )
+    return listings
+
+
+def render_category_pills(listings: list[Listing], current: str) -> str:
+    pills: list[str] = []
+    for listing in listings:
+        if not listing.name.startswith("categoria-"):
+            continue
+        current_attr = ' aria-current="page"' if listing.name == current else ""
+        label = html.escape(listing.heading.removeprefix("Categoría: "))
+        pills.append(
+            f'        <a class="category-pill" href="{listing.page_name(1)}"{current_attr}>{label}</a>'
+        )
+    return "\n".join(pills)
+
+
+def render_pagination(listing: Listing, page: int) -> str:
+    if listing.page_count == 1:
+        return ""
+
+    links: list[str] = []
+    if page > 1:
+        links.append(f'        <a class="category-pill" href="{listing.page_name(page - 1)}">« Anterior</a>')
+    for number in range(1, listing.page_count + 1):
+        current_attr = ' aria-current="page"' if number == page else ""
+        links.append(f'        <a class="category-pill" href="{listing.page_name(number)}"{current_attr}>{number}</a>')
+    if page < listing.page_count:
+        links.append(f'        <a class="category-pill" href="{listing.page_name(page + 1)}">Siguiente »</a>')
+    return (
+        '      <nav class="pagination" aria-label="Paginación">\n'
+        + "\n".join(links)
+        + "\n      </nav>"
+    )
+
+
+def render_listing_page(
+    listing: Listing,
+    page: int,
+    category_pills: str,
+    images: dict[str, dict],
+    fragments: FragmentCache | None = None,
+    layout: str = "flat",
+) -> str:
+    start = (page - 1) * LISTING_PAGE_SIZE
+    title = listing.heading if page == 1 else f"{listing.heading} (página {page})"
+    return get_template("listing.html").render(
+        title=title,
+        description=listing.intro,
+        canonical_url=listing.page_name(page),
+        heading=title,
+        intro=listing.intro,
+        categories=category_pills,
+        stream=render_stream(listing.posts[start : start + LISTING_PAGE_SIZE], "../", images, fragments, layout),
+        pagination=render_pagination(listing, page),
+    )
+
+
+def listing_build_key(
+    listing: Listing,
+    page: int,
+    category_pills: str,
+    renderer: str,
+    images: dict[str, dict],
+) -> str:
+    start = (page - 1) * LISTING_PAGE_SIZE
+    members = listing.posts[start : start + LISTING_PAGE_SIZE]
+    return hash_json(
+        {
+            "renderer": renderer,
+            "heading": listing.heading,
+            "page": [page, listing.page_count],
+            "categories": category_pills,
+            "posts": [[post.slug, post.source_hash] for post in members],
+            "images": post_images(members, images),
+        }
+    )
+
+
+def write_listing_pages(
+    published: list[Post],
+    manifest: dict,
+    renderer: str,
+    assets: dict[str, str],
+    images: dict[str, dict],
+    fragments: FragmentCache | None = None,
+    styles: PageStyles | None = None,
+    layout: str = "flat",
+) -> list[Listing]:
+    """Render archive, category and tag pages whose membership changed.
+
+    Pages generated by an earlier build that no longer have any posts are
+    removed. Returns every listing, rendered or not.
+    """
+    previous: dict[str, str] = manifest.get("pages", {})
+    current: dict[str, str] = {}
+    listings = collect_listings(published)
+    for listing in listings:
+        category_pills = render_category_pills(listings, listing.name)
+        for page in range(1, listing.page_count + 1):
+            name = listing.page_name(page)
+            key = listing_build_key(listing, page, category_pills, renderer, images)
+            if previous.get(name) != key or not (PAGES_DIR / name).exists():
+                page_html = render_listing_page(listing, page, category_pills, images, fragments, layout)
+                page_html = style_page(rewrite_asset_urls(page_html, assets), styles or PageStyles(), "../")
+                write_text_if_changed(PAGES_DIR / name, page_html)
+            current[name] = key
+
+    for name in previous.keys() - current.keys():
+        (PAGES_DIR / name).unlink(missing_ok=True)
+    manifest["pages"] = current
+    return listings
+
+
 def select_related(post: Post, candidates: list[Post], limit: int = 3) -> list[Post]:
     if not post.tags:
         return []
 
-    base_tags = {normalize_tag(tag) for tag in post.tags if tag.strip()}
+    base_tags = normalized_tag_set(post.tags)
     if not base_tags:
         return []
 
@@ -560,7 +1414,7 @@ def select_related(post: Post, candidates: list[Post], limit: int = 3) -> list[P
     for candidate in candidates:
         if candidate.slug == post.slug:
             continue
-        candidate_tags = {normalize_tag(tag) for tag in candidate.tags if tag.strip()}
+        candidate_tags = normalized_tag_set(candidate.tags)
         overlap = base_tags & candidate_tags
         if not overlap:
             continue
@@ -570,52 +1424,2112 @@ def select_related(post: Post, candidates: list[Post], limit: int = 3) -> list[P
     return [candidate for _, _, candidate in scored[:limit]]
 
 
-def update_index(stream_html: str, portada_html: str | None = None) -> None:
-    content = INDEX_PATH.read_text(encoding="utf-8")
-    start_marker = "<!-- posts:begin -->"
-    end_marker = "<!-- posts:end -->"
-    portada_start = "<!-- portada:begin -->"
-    portada_end = "<!-- portada:end -->"
+class RelatedIndex:
+    """Tag -> candidate inverted index answering ``select_related`` queries.
 
-    if start_marker not in content or end_marker not in content:
-        raise RuntimeError("Missing stream markers in index.html")
+    Built once per run over the published posts. A query only touches the
+    candidates sharing at least one tag with the post and keeps the best
+    ``limit`` of them with bounded heap selection, returning exactly what
+    ``select_related`` returns for the same candidate list.
+    """
 
-    before, rest = content.split(start_marker, 1)
-    _, after = rest.split(end_marker, 1)
+    def __init__(self, candidates: list[Post]) -> None:
+        self.candidates = candidates
+        self.datetimes = [candidate.datetime for candidate in candidates]
+        self.newest_first = all(
+            newer >= older for newer, older in zip(self.datetimes, self.datetimes[1:])
+        )
+        self.positions: dict[str, list[int]] = {}
+        self.postings: dict[str, list[int]] = {}
+        for position, candidate in enumerate(candidates):
+            self.positions.setdefault(candidate.slug, []).append(position)
+            for tag in normalized_tag_set(candidate.tags):
+                self.postings.setdefault(tag, []).append(position)
+
+    def select(self, post: Post, limit: int = 3) -> list[Post]:
+        if not post.tags or limit <= 0:
+            return []
+
+        base_tags = normalized_tag_set(post.tags)
+        if not base_tags:
+            return []
+
+        overlaps = collections.Counter(
+            itertools.chain.from_iterable(self.postings.get(tag, ()) for tag in base_tags)
+        )
+        for position in self.positions.get(post.slug, ()):
+            overlaps.pop(position, None)
+        if not overlaps:
+            return []
+
+        if self.newest_first:
+            # Candidates are already in datetime order, so ties on overlap go
+            # to the lowest positions and no datetime comparison is needed.
+            cutoff = heapq.nlargest(limit, overlaps.values())[-1]
+            above = [position for position, overlap in overlaps.items() if overlap > cutoff]
+            at_cutoff = (position for position, overlap in overlaps.items() if overlap == cutoff)
+            chosen = above + heapq.nsmallest(limit - len(above), at_cutoff)
+            chosen.sort(key=lambda position: (-overlaps[position], position))
+        else:
+            datetimes = self.datetimes
+            # The negated position breaks (overlap, datetime) ties in
+            # candidate order, matching the stable sort in select_related.
+            chosen = heapq.nlargest(
+                limit,
+                overlaps,
+                key=lambda position: (overlaps[position], datetimes[position], -position),
+            )
+        return [self.candidates[position] for position in chosen]
+
+    def neighbours(self, post: Post) -> set[str]:
+        """Slugs of the candidates that could list ``post`` as related."""
+        positions = itertools.chain.from_iterable(self.postings.get(tag, ()) for tag in normalized_tag_set(post.tags))
+        return {self.candidates[position].slug for position in positions}
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def term_hash(term: str) -> int:
+    # Not hash(): signatures are stored, so they must not depend on PYTHONHASHSEED.
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def similarity_terms(post: Post, body: str) -> set[str]:
+    """Distinct body, title and tag terms; title terms count twice via a prefix."""
+    title = set(search_terms(post.title))
+    terms = set(search_terms(MARKDOWN_URL_PATTERN.sub("]", body)))
+    terms |= title
+    terms.update(f"title:{term}" for term in title)
+    terms.update(f"tag:{tag}" for tag in normalized_tag_set(post.tags))
+    return terms
+
+
+def minhash_signature(terms: Iterable[str]) -> array.array:
+    """Keep the smallest hash per bin; empty bins hold ``SIGNATURE_EMPTY``."""
+    signature = array.array("Q", [SIGNATURE_EMPTY]) * SIMILARITY_BINS
+    for term in terms:
+        value, slot = divmod(term_hash(term), SIMILARITY_BINS)
+        if value < signature[slot]:
+            signature[slot] = value
+    return signature
+
+
+def post_signatures(posts: list[Post], path: Path | None = None) -> dict[str, array.array]:
+    """MinHash signatures of ``posts``, reusing the stored ones of unchanged sources."""
+    connection = open_build_cache(path)
+    stored = {slug: (key, blob) for slug, key, blob in connection.execute("SELECT slug, key, signature FROM signatures")}
+    signatures: dict[str, array.array] = {}
+    fresh: list[tuple[str, str, bytes]] = []
+    for post in posts:
+        key = f"{SIGNATURE_VERSION}:{post.source_hash}"
+        row = stored.get(post.slug)
+        if row and row[0] == key:
+            signature = array.array("Q")
+            signature.frombytes(row[1])
+        else:
+            signature = minhash_signature(similarity_terms(post, post.load_body()))
+            fresh.append((post.slug, key, signature.tobytes()))
+        signatures[post.slug] = signature
+    with connection:
+        connection.executemany("INSERT OR REPLACE INTO signatures (slug, key, signature) VALUES (?, ?, ?)", fresh)
+        prune_build_cache(connection, "signatures", set(signatures))
+    connection.close()
+    return signatures
+
+
+class SimilarityIndex:
+    """Related posts by title/body/tag similarity, via MinHash and LSH buckets.
+
+    A query scores only the candidates sharing at least one LSH band with the
+    post, by the estimated Jaccard similarity of their term sets; when fewer
+    than ``limit`` clear ``SIMILARITY_MIN_SCORE`` the tag ranking fills in.
+    Buckets larger than ``SIMILARITY_BUCKET_LIMIT`` are dropped, like
+    stopwords, so a lookup never degenerates into a scan of the archive.
+    """
+
+    def __init__(
+        self,
+        candidates: list[Post],
+        signatures: dict[str, array.array],
+        fallback: RelatedIndex,
+    ) -> None:
+        self.candidates = candidates
+        self.signatures = signatures
+        self.fallback = fallback
+        self.empty_bins = {
+            slug: sum(1 << slot for slot, value in enumerate(signature) if value == SIGNATURE_EMPTY)
+            for slug, signature in signatures.items()
+        }
+        buckets: dict[tuple[int, ...], list[int]] = {}
+        for position, candidate in enumerate(candidates):
+            for band in self.bands(signatures[candidate.slug]):
+                buckets.setdefault(band, []).append(position)
+        self.buckets = {band: bucket for band, bucket in buckets.items() if len(bucket) <= SIMILARITY_BUCKET_LIMIT}
+
+    @staticmethod
+    def bands(signature: array.array) -> Iterator[tuple[int, ...]]:
+        for start in range(0, SIMILARITY_BINS, SIMILARITY_BAND_ROWS):
+            rows = signature[start : start + SIMILARITY_BAND_ROWS]
+            if SIGNATURE_EMPTY not in rows:
+                yield (start, *rows)
+
+    def similarity(self, left: str, right: str) -> float:
+        """Estimated Jaccard similarity; bins empty in both posts are ignored."""
+        same = sum(map(operator.eq, self.signatures[left], self.signatures[right]))
+        both_empty = (self.empty_bins[left] & self.empty_bins[right]).bit_count()
+        filled = SIMILARITY_BINS - both_empty
+        return (same - both_empty) / filled if filled else 0.0
+
+    def lookup(self, post: Post) -> set[int]:
+        signature = self.signatures[post.slug]
+        positions = set(itertools.chain.from_iterable(self.buckets.get(band, ()) for band in self.bands(signature)))
+        return {position for position in positions if self.candidates[position].slug != post.slug}
+
+    def select(self, post: Post, limit: int = 3) -> list[Post]:
+        if limit <= 0:
+            return []
+        scored = []
+        for position in self.lookup(post):
+            candidate = self.candidates[position]
+            score = self.similarity(post.slug, candidate.slug)
+            if score >= SIMILARITY_MIN_SCORE:
+                scored.append((score, candidate.datetime, -position))
+        chosen = [self.candidates[-position] for _, _, position in heapq.nlargest(limit, scored)]
+        if len(chosen) < limit:
+            slugs = {candidate.slug for candidate in chosen}
+            extra = (candidate for candidate in self.fallback.select(post, limit) if candidate.slug not in slugs)
+            chosen.extend(itertools.islice(extra, limit - len(chosen)))
+        return chosen
+
+    def neighbours(self, post: Post) -> set[str]:
+        similar = {self.candidates[position].slug for position in self.lookup(post)}
+        return similar | self.fallback.neighbours(post)
+
+
+REGION_PATTERN = re.compile(
+    r"^(?P<indent>[ \t]*)<!-- (?P<name>[\w-]+):begin -->.*?<!-- (?P=name):end -->",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+def replace_regions(text: str, regions: dict[str, str]) -> tuple[str, set[str]]:
+    """Replace every ``<!-- name:begin/end -->`` region named in ``regions`` in one scan.
+
+    Returns the new text and the names that were found. Regions not listed
+    are copied as they are; the end marker is re-indented like the begin one.
+    """
+    found: set[str] = set()
+
+    def replace(match: re.Match[str]) -> str:
+        name = match["name"]
+        if name not in regions:
+            return match[0]
+        found.add(name)
+        indent = match["indent"]
+        return f"{indent}<!-- {name}:begin -->\n{regions[name]}\n{indent}<!-- {name}:end -->"
+
+    return REGION_PATTERN.sub(replace, text), found
+
+
+def update_regions(updates: dict[Path, dict[str, str]]) -> list[Path]:
+    """Apply region replacements across files and return the ones rewritten.
+
+    Files whose bytes would not change are left alone (mtime included) and
+    the others are replaced atomically.
+    """
+    changed: list[Path] = []
+    for path, regions in updates.items():
+        text = path.read_text(encoding="utf-8")
+        updated, found = replace_regions(text, regions)
+        missing = regions.keys() - found
+        if missing:
+            raise RuntimeError(f"Missing {', '.join(sorted(missing))} region markers in {path.name}")
+        if updated != text:
+            write_bytes_atomic(path, updated.encode("utf-8"))
+            changed.append(path)
+    return changed
+
+
+def render_sidebar_categories(listings: list[Listing]) -> str:
+    return "\n".join(
+        f'              <a class="category-pill" href="pages/{listing.page_name(1)}">'
+        f'#{html.escape(listing.name.removeprefix("categoria-"))}</a>'
+        for listing in listings
+        if listing.name.startswith("categoria-")
+    )
 
-    updated = f"{before}{start_marker}\n{stream_html}\n        {end_marker}{after}"
 
-    if portada_html is not None:
-        if portada_start not in updated or portada_end not in updated:
-            raise RuntimeError("Missing portada markers in index.html")
-        before_portada, rest_portada = updated.split(portada_start, 1)
-        _, after_portada = rest_portada.split(portada_end, 1)
-        updated = f"{before_portada}{portada_start}\n{portada_html}\n        {portada_end}{after_portada}"
+def render_sidebar_tags(listings: list[Listing], limit: int = SIDEBAR_TAG_COUNT) -> str:
+    tags = [listing for listing in listings if listing.name.startswith("etiqueta-")]
+    top = heapq.nsmallest(limit, tags, key=lambda listing: (-len(listing.posts), listing.name))
+    return "\n".join(
+        f"              <span>{html.escape(listing.heading)}</span>" for listing in top
+    )
 
-    INDEX_PATH.write_text(updated, encoding="utf-8")
 
+def render_search_categories(listings: list[Listing]) -> str:
+    options: list[str] = []
+    for listing in listings:
+        if not listing.name.startswith("categoria-"):
+            continue
+        options.append(
+            '              <label class="filter-option">\n'
+            f'                <input type="checkbox" name="categoria" value="{listing.name.removeprefix("categoria-")}" />\n'
+            f"                {html.escape(listing.heading.removeprefix('Categoría: '))}\n"
+            "              </label>"
+        )
+    return "\n".join(options)
+
+
+def write_text_if_changed(path: Path, text: str) -> bool:
+    """Write ``text`` atomically unless the file already holds exactly that content."""
+    data = text.encode("utf-8")
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_bytes_atomic(path, data)
+    return True
+
+
+def build_assets(manifest: dict) -> dict[str, str]:
+    """Write content-hashed copies of the CSS and JS under ``assets/dist``.
+
+    Returns the map from each source (``css/style.css``) to its fingerprinted
+    path relative to ``assets/``. Sources whose mtime and size match the
+    manifest are not re-read, and copies no source maps to are removed.
+    """
+    previous: dict[str, dict] = manifest.get("assets", {})
+    current: dict[str, dict] = {}
+    for kind in ASSET_KINDS:
+        for path in sorted((ASSETS_DIR / kind).glob(f"*.{kind}")):
+            name = f"{kind}/{path.name}"
+            stat = path.stat()
+            signature = [stat.st_mtime_ns, stat.st_size]
+            entry = previous.get(name)
+            if entry is None or entry["stat"] != signature or not (ASSETS_DIR / entry["url"]).exists():
+                data = path.read_bytes()
+                url = f"dist/{kind}/{path.stem}.{hash_bytes(data)[:ASSET_HASH_LENGTH]}{path.suffix}"
+                target = ASSETS_DIR / url
+                if not target.exists():
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.write_bytes(data)
+                entry = {"stat": signature, "url": url}
+            current[name] = entry
+
+    outputs = {ASSETS_DIR / entry["url"] for entry in current.values()}
+    for kind in ASSET_KINDS:
+        for path in (ASSET_DIST_DIR / kind).glob("*"):
+            if compressed_original(path) not in outputs:
+                path.unlink()
+    manifest["assets"] = current
+    return {name: entry["url"] for name, entry in current.items()}
+
+
+def rewrite_asset_urls(text: str, assets: dict[str, str]) -> str:
+    """Point every CSS/JS reference with an entry in ``assets`` at its hashed copy."""
+
+    def replace(match: re.Match[str]) -> str:
+        url = assets.get(f"{match['kind']}/{match['name']}.{match['ext']}")
+        return f"{match['prefix']}assets/{url}" if url else match[0]
+
+    return ASSET_URL_PATTERN.sub(replace, text)
+
+
+def rewrite_asset_references(paths: Iterable[Path], assets: dict[str, str], styles: PageStyles) -> None:
+    """Rewrite asset references and stylesheet links in pages the build does not render itself."""
+    for path in paths:
+        text = path.read_text(encoding="utf-8")
+        updated = style_page(rewrite_asset_urls(text, assets), styles, "" if path.parent == ROOT else "../")
+        if updated != text:
+            path.write_text(updated, encoding="utf-8")
+
+
+CSS_COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.S)
+CSS_STRUCTURE_PATTERN = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|[{};]")
+# Pseudo-classes, pseudo-elements and attribute tests never rule a selector out.
+SELECTOR_IGNORED_PATTERN = re.compile(r"\[[^\]]*\]|::?[\w-]+(?:\([^)]*\))?")
+SELECTOR_TOKEN_PATTERN = re.compile(r"[.#]?-?[A-Za-z_][\w-]*")
+PAGE_TAG_PATTERN = re.compile(r"<([A-Za-z][\w-]*)")
+PAGE_ATTRIBUTE_PATTERN = re.compile(r'\s(class|id)="([^"]*)"')
+STYLESHEET_LINK_PATTERN = re.compile(r'^([ \t]*)<link rel="stylesheet" href="([^"]+)" />$', re.M)
+DEFERRED_STYLESHEET_PATTERN = re.compile(
+    r'^([ \t]*)(?:<style data-critical>[^<]*</style>\n[ \t]*)?'
+    r'<link rel="preload" href="([^"]+)" as="style" onload="[^"]*" />\n'
+    r'[ \t]*<noscript><link rel="stylesheet" href="\2" /></noscript>$',
+    re.M,
+)
+ICON_STYLESHEET_PATTERN = re.compile(
+    r'href="(?:https://cdn\.jsdelivr\.net/npm/bootstrap-icons@[^/"]+/font/bootstrap-icons\.min\.css'
+    r'|(?:\.\./)?assets/dist/icons/icons\.[0-9a-f]{8}\.css)"'
+)
+ICON_CLASS_PATTERN = re.compile(r"\bbi-[a-z0-9-]+")
+ICON_RULE_PATTERN = re.compile(r"\.(bi-[\w-]+)::?before")
+ICON_CONTENT_PATTERN = re.compile(r'content:\s*"\\([0-9a-fA-F]+)"')
+FONT_SOURCE_PATTERN = re.compile(r"src:[^;]*;?")
+
+
+def css_blocks(text: str) -> list[tuple[str, str | None]]:
+    """Split a comment-free stylesheet into top-level ``(prelude, body)`` pairs.
+
+    Statements without a block (``@import``, ``@charset``) have no body.
+    """
+    blocks: list[tuple[str, str | None]] = []
+    depth = 0
+    start = body_start = 0
+    prelude = ""
+    for match in CSS_STRUCTURE_PATTERN.finditer(text):
+        token = match[0]
+        if token == "{":
+            if depth == 0:
+                prelude = text[start : match.start()].strip()
+                body_start = match.end()
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, text[body_start : match.start()]))
+                start = match.end()
+        elif token == ";" and depth == 0:
+            statement = text[start : match.start()].strip()
+            if statement:
+                blocks.append((statement, None))
+            start = match.end()
+    return blocks
+
+
+def css_text(prelude: str, body: str | None) -> str:
+    prelude = " ".join(prelude.split())
+    return f"{prelude};" if body is None else f"{prelude}{{{' '.join(body.split())}}}"
+
+
+def selector_requirements(selector: str) -> frozenset[str]:
+    """Classes (``.x``), ids (``#x``) and elements a page needs to match ``selector``."""
+    return frozenset(
+        token if token[0] in ".#" else token.lower()
+        for token in SELECTOR_TOKEN_PATTERN.findall(SELECTOR_IGNORED_PATTERN.sub(" ", selector))
+    )
 
-def main() -> None:
-    authors = load_authors()
-    posts = [parse_post(path) for path in POSTS_DIR.glob("*.txt")]
-    posts_sorted = sorted(posts, key=lambda post: post.datetime, reverse=True)
 
-    published = [post for post in posts_sorted if post.status.lower() == "published"]
+def page_tokens(text: str) -> set[str]:
+    """The elements, classes and ids present in an HTML page."""
+    tokens = {tag.lower() for tag in PAGE_TAG_PATTERN.findall(text)}
+    for attribute, value in PAGE_ATTRIBUTE_PATTERN.findall(text):
+        prefix = "." if attribute == "class" else "#"
+        tokens.update(prefix + name for name in value.split())
+    return tokens
+
+
+@dataclasses.dataclass(slots=True)
+class CssRule:
+    text: str = ""
+    # One requirement set per selector in the list; None keeps the rule always.
+    selectors: list[frozenset[str]] | None = None
+    children: list[CssRule] | None = None
+
+
+class CriticalCss:
+    """The rules of one stylesheet that a given page can match.
+
+    A selector matches when the page contains every element, class and id it
+    names. Pseudo-classes and attribute tests are ignored, so state rules
+    (``:hover``, ``[data-theme]``) stay whenever their subject is on the page;
+    rules for classes only scripts add arrive with the deferred stylesheet.
+    At-rules other than ``@media`` and ``@supports`` are always kept. Pages
+    with the same relevant tokens share one result.
+    """
+
+    def __init__(self, css: str) -> None:
+        self.vocabulary: set[str] = set()
+        self.rules = self.parse(CSS_COMMENT_PATTERN.sub("", css))
+        self.subsets: dict[frozenset[str], str] = {}
+
+    def parse(self, css: str) -> list[CssRule]:
+        rules: list[CssRule] = []
+        for prelude, body in css_blocks(css):
+            if body is not None and prelude.startswith(("@media", "@supports")):
+                rules.append(CssRule(text=" ".join(prelude.split()), children=self.parse(body)))
+            elif body is None or prelude.startswith("@"):
+                rules.append(CssRule(text=css_text(prelude, body)))
+            else:
+                selectors = [selector_requirements(selector) for selector in prelude.split(",")]
+                self.vocabulary.update(*selectors)
+                rules.append(CssRule(text=css_text(prelude, body), selectors=selectors))
+        return rules
+
+    def extract(self, rules: list[CssRule], used: frozenset[str]) -> Iterator[str]:
+        for rule in rules:
+            if rule.children is not None:
+                inner = "".join(self.extract(rule.children, used))
+                if inner:
+                    yield f"{rule.text}{{{inner}}}"
+            elif rule.selectors is None or any(selector <= used for selector in rule.selectors):
+                yield rule.text
+
+    def for_page(self, text: str) -> str:
+        used = frozenset(page_tokens(text) & self.vocabulary)
+        subset = self.subsets.get(used)
+        if subset is None:
+            subset = self.subsets[used] = "".join(self.extract(self.rules, used))
+        return subset
+
+
+@dataclasses.dataclass(slots=True)
+class PageStyles:
+    """How pages load their stylesheets; applied by ``style_page``."""
+
+    critical: CriticalCss | None = None
+    # The icon subset stylesheet relative to ``assets/``, or None for the CDN.
+    icons: str | None = None
+
+    @property
+    def key(self) -> list:
+        return [self.critical is not None, self.icons or ICONS_CDN_URL]
+
+
+def style_page(text: str, styles: PageStyles, prefix: str) -> str:
+    """Point the icon link at ``styles.icons`` and defer stylesheets per ``styles``.
+
+    ``prefix`` leads from the page back to the site root. Links deferred by an
+    earlier build are put back first, so the result does not depend on what
+    the page went through before.
+    """
+    text = DEFERRED_STYLESHEET_PATTERN.sub(r'\1<link rel="stylesheet" href="\2" />', text)
+    icons = f"{prefix}assets/{styles.icons}" if styles.icons else ICONS_CDN_URL
+    text = ICON_STYLESHEET_PATTERN.sub(f'href="{icons}"', text)
+    if styles.critical is None:
+        return text
+    critical = styles.critical.for_page(text)
+
+    def defer(match: re.Match[str]) -> str:
+        indent, url = match[1], match[2]
+        lines = []
+        asset = ASSET_URL_PATTERN.search(url)
+        if asset and f"{asset['kind']}/{asset['name']}.{asset['ext']}" == CRITICAL_STYLESHEET:
+            lines.append(f"<style data-critical>{critical}</style>")
+        elif not url.startswith(DEFERRED_STYLESHEET_HOSTS):
+            return match[0]
+        lines.append(f'<link rel="preload" href="{url}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'" />')
+        lines.append(f'<noscript><link rel="stylesheet" href="{url}" /></noscript>')
+        return "\n".join(indent + line for line in lines)
+
+    return STYLESHEET_LINK_PATTERN.sub(defer, text)
+
+
+def referenced_icons(generated_pages: Iterable[str]) -> set[str]:
+    """Bootstrap Icons classes named by the templates, hand-written pages and scripts."""
+    generated = {PAGES_DIR / name for name in generated_pages}
+    paths = [INDEX_PATH, *(path for path in PAGES_DIR.glob("*.html") if path not in generated)]
+    paths += [*TEMPLATES_DIR.glob("*.html"), *(ASSETS_DIR / "js").glob("*.js")]
+    names: set[str] = set()
+    for path in paths:
+        if path.exists():
+            names.update(ICON_CLASS_PATTERN.findall(path.read_text(encoding="utf-8")))
+    return names
+
+
+def subset_font(path: Path, codepoints: set[int]) -> tuple[bytes, str]:
+    """The glyphs of ``codepoints`` from ``path`` and their format.
+
+    Without fontTools (or brotli, for WOFF2 sources) the font is copied whole.
+    """
+    flavor = path.suffix[1:]
+    if font_subset is None or (flavor == "woff2" and brotli is None):
+        return path.read_bytes(), flavor
+    options = font_subset.Options()
+    options.flavor = "woff2" if brotli is not None else "woff"
+    font = font_subset.load_font(str(path), options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    font_subset.save_font(font, buffer, options)
+    return buffer.getvalue(), options.flavor
+
+
+def build_icons(manifest: dict, subset: bool = True) -> str | None:
+    """Write the icon stylesheet and font subset for the icons the site uses.
+
+    Returns the stylesheet path relative to ``assets/``, or None when pages
+    keep the CDN stylesheet: without ``subset``, or when no bootstrap-icons
+    copy is vendored (``scripts/fetch_icons.py`` downloads one), which is
+    only worth a warning if the subset was asked for.
+    """
+    stylesheet = ICONS_VENDOR_DIR / "bootstrap-icons.css"
+    fonts = sorted((ICONS_VENDOR_DIR / "fonts").glob("bootstrap-icons.woff*"))
+    if not subset or not stylesheet.exists() or not fonts:
+        if subset:
+            print(
+                f"aviso: no hay copia de bootstrap-icons en {ICONS_VENDOR_DIR.relative_to(ROOT)}; las páginas "
+                "cargan la hoja completa del CDN. Descárgala con scripts/fetch_icons.py.",
+                file=sys.stderr,
+            )
+        manifest.pop("icons", None)
+        for path in ICON_DIST_DIR.glob("*"):
+            path.unlink()
+        return None
+
+    css = CSS_COMMENT_PATTERN.sub("", stylesheet.read_text(encoding="utf-8"))
+    by_flavor = {path.suffix[1:]: path for path in fonts}
+    # WOFF2 is smaller, but fontTools needs brotli to read it: a WOFF subset
+    # still beats shipping the whole WOFF2 file.
+    preferred = "woff" if font_subset is not None and brotli is None else "woff2"
+    font = by_flavor.get(preferred) or fonts[0]
+    names = sorted(referenced_icons(manifest.get("pages", {})))
+    key = hash_json([hash_bytes(css.encode("utf-8")), hash_bytes(font.read_bytes()), names])
+    key = hash_json([key, font_subset is not None, brotli is not None])
+    previous = manifest.get("icons")
+    if previous and previous["key"] == key and (ASSETS_DIR / previous["url"]).exists():
+        return previous["url"]
+
+    used = set(names)
+    codepoints: set[int] = set()
+    rules: list[tuple[str, str | None]] = []
+    for prelude, body in css_blocks(css):
+        icon = ICON_RULE_PATTERN.fullmatch(prelude)
+        if icon and body is not None:
+            content = ICON_CONTENT_PATTERN.search(body)
+            if icon[1] not in used or not content:
+                continue
+            codepoints.add(int(content[1], 16))
+        rules.append((prelude, body))
+
+    data, flavor = subset_font(font, codepoints)
+    font_name = f"bootstrap-icons.{hash_bytes(data)[:ASSET_HASH_LENGTH]}.{flavor}"
+    source = f'src: url("{font_name}") format("{flavor}");'
+    text = "\n".join(
+        css_text(prelude, FONT_SOURCE_PATTERN.sub(source, body) if prelude == "@font-face" else body)
+        for prelude, body in rules
+    )
+    css_name = f"icons.{hash_bytes(text.encode('utf-8'))[:ASSET_HASH_LENGTH]}.css"
+    ICON_DIST_DIR.mkdir(parents=True, exist_ok=True)
+    write_bytes_atomic(ICON_DIST_DIR / font_name, data)
+    write_bytes_atomic(ICON_DIST_DIR / css_name, (text + "\n").encode("utf-8"))
+    for path in ICON_DIST_DIR.glob("*"):
+        if compressed_original(path).name not in (font_name, css_name):
+            path.unlink()
+    url = f"dist/icons/{css_name}"
+    manifest["icons"] = {"key": key, "url": url}
+    return url
+
+
+def derive_image(path: Path, signature: list[int]) -> dict:
+    """Measure ``path`` and write its resized copies, named by content hash.
+
+    Without Pillow only the intrinsic size is recorded, so pages still get
+    ``width``/``height`` but no ``srcset``.
+    """
+    data = path.read_bytes()
+    entry = {"stat": signature, "resized": Image is not None, "width": 0, "height": 0, "variants": []}
+    if Image is None:
+        size = image_dimensions(data)
+        if size:
+            entry["width"], entry["height"] = size
+        return entry
+
+    digest = hash_bytes(data)[:ASSET_HASH_LENGTH]
+    with Image.open(io.BytesIO(data)) as source:
+        image_format = source.format
+        # Palette images would otherwise be resized with nearest-neighbour.
+        image = source.convert("RGBA") if source.mode == "P" else source
+        width, height = image.size
+        entry["width"], entry["height"] = width, height
+        for target_width in IMAGE_WIDTHS:
+            if target_width >= width:
+                break
+            target = IMAGE_DIST_DIR / f"{path.stem}.{digest}-{target_width}w{path.suffix.lower()}"
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                resized = image.resize((target_width, round(height * target_width / width)), Image.Resampling.LANCZOS)
+                partial = target.with_name(f".{target.name}")
+                resized.save(partial, format=image_format, **IMAGE_SAVE_OPTIONS.get(image_format, {}))
+                os.replace(partial, target)
+            entry["variants"].append([target.relative_to(ROOT).as_posix(), target_width])
+    return entry
+
+
+def write_bytes_atomic(path: Path, data: bytes) -> None:
+    """Write through a hidden temporary file so readers never see a partial file."""
+    partial = path.with_name(f".{path.name}")
+    partial.write_bytes(data)
+    os.replace(partial, path)
+
+
+def compressed_original(path: Path) -> Path:
+    """The file a ``.gz``/``.br`` copy was made from; other paths as they are."""
+    return path.with_suffix("") if path.suffix in COMPRESSED_SUFFIXES else path
+
+
+def compressed_directories() -> list[Path]:
+    """Every directory ``compressed_outputs`` may write copies into."""
+    directories = [ROOT, POSTS_DIR, PAGES_DIR, SEARCH_DIR, ICON_DIST_DIR, *(ASSET_DIST_DIR / kind for kind in ASSET_KINDS)]
+    return directories + [path for path in POSTS_DIR.glob("*/*") if path.is_dir()]
+
+
+def compressed_outputs() -> list[Path]:
+    """Every generated file with one of ``COMPRESSIBLE_SUFFIXES``."""
+    paths = [INDEX_PATH, *POSTS_DIR.rglob("*.html"), *PAGES_DIR.glob("*.html"), *SEARCH_DIR.glob("*.json")]
+    paths += [ROOT / name for name in FEED_FILES.values()]
+    paths += ROOT.glob("sitemap*.xml")
+    for kind in ASSET_KINDS:
+        paths += (ASSET_DIST_DIR / kind).glob(f"*.{kind}")
+    paths += ICON_DIST_DIR.glob("*.css")
+    return [path for path in paths if path.is_file()]
+
+
+def compress_file(path: Path, previous_hash: str | None) -> str:
+    """Write ``.gz`` and, with brotli installed, ``.br`` siblings of ``path``.
+
+    Returns the content hash; nothing is recompressed when it matches
+    ``previous_hash`` and the siblings are already there.
+    """
+    data = path.read_bytes()
+    digest = hash_bytes(data)
+    gz_path = path.with_name(f"{path.name}.gz")
+    br_path = path.with_name(f"{path.name}.br")
+    if digest == previous_hash and gz_path.exists() and (brotli is None or br_path.exists()):
+        return digest
+    write_bytes_atomic(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is None:
+        # A sibling left by an earlier build with brotli would be stale now.
+        br_path.unlink(missing_ok=True)
+    else:
+        write_bytes_atomic(br_path, brotli.compress(data, quality=11, mode=brotli.MODE_TEXT))
+    return digest
+
+
+def compress_outputs(manifest: dict, workers: int = 1) -> int:
+    """Precompress the outputs whose content changed; return how many were checked.
+
+    Files whose mtime and size match the manifest are skipped without being
+    read, and siblings whose original no longer exists are removed.
+    """
+    previous: dict[str, dict] = manifest.get("compressed", {})
+    current: dict[str, dict] = {}
+    pending: list[tuple[str, Path, list[int]]] = []
+    for path in compressed_outputs():
+        name = path.relative_to(ROOT).as_posix()
+        stat = path.stat()
+        signature = [stat.st_mtime_ns, stat.st_size]
+        entry = previous.get(name)
+        if (
+            entry
+            and entry["stat"] == signature
+            and entry["brotli"] == (brotli is not None)
+            and path.with_name(f"{path.name}.gz").exists()
+            and (brotli is None or path.with_name(f"{path.name}.br").exists())
+        ):
+            current[name] = entry
+        else:
+            pending.append((name, path, signature))
+
+    hashes = [previous[name]["hash"] if name in previous else None for name, _, _ in pending]
+    paths = [path for _, path, _ in pending]
+    if workers > 1 and len(pending) > 1:
+        workers = min(workers, len(pending))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(compress_file, paths, hashes, chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        digests = [compress_file(path, digest) for path, digest in zip(paths, hashes)]
+    for (name, _, signature), digest in zip(pending, digests):
+        current[name] = {"stat": signature, "hash": digest, "brotli": brotli is not None}
+
+    remove_compressed_copies(orphans_only=True)
+    manifest["compressed"] = current
+    return len(pending)
+
+
+def remove_compressed_copies(orphans_only: bool = False) -> None:
+    """Remove the ``.gz``/``.br`` copies of generated files.
+
+    With ``orphans_only`` just those whose original no longer exists go;
+    otherwise all of them, since a build without ``--compress`` would leave
+    them out of date with the files it rewrites.
+    """
+    for directory in compressed_directories():
+        for suffix in COMPRESSED_SUFFIXES:
+            for sibling in directory.glob(f"*{suffix}"):
+                original = sibling.with_suffix("")
+                if original.suffix in COMPRESSIBLE_SUFFIXES and not (orphans_only and original.exists()):
+                    sibling.unlink()
+
+
+PAGE_RESOURCE_PATTERN = re.compile(r"<(link|script|img)\b([^>]*)>")
+HTML_ATTRIBUTE_PATTERN = re.compile(r'([\w-]+)="([^"]*)"')
+PRELOAD_KINDS = {"style": "css", "script": "js", "image": "images"}
+
+
+def page_resources(text: str) -> Iterator[tuple[str, str]]:
+    """``(kind, url)`` for every stylesheet, script and image a page loads."""
+    for match in PAGE_RESOURCE_PATTERN.finditer(text):
+        tag = match[1]
+        attributes = dict(HTML_ATTRIBUTE_PATTERN.findall(match[2]))
+        if tag == "img":
+            kind, url = "images", attributes.get("src")
+        elif tag == "script":
+            kind, url = "js", attributes.get("src")
+        elif attributes.get("rel") == "stylesheet":
+            kind, url = "css", attributes.get("href")
+        elif attributes.get("rel") == "preload":
+            kind, url = PRELOAD_KINDS.get(attributes.get("as", "")), attributes.get("href")
+        else:
+            continue
+        if kind and url:
+            yield kind, html.unescape(url)
+
+
+@dataclasses.dataclass
+class PageWeight:
+    """Bytes of a generated page plus the local CSS, JS and images it loads.
+
+    A file counts once per page however often it is referenced (a preload
+    and its ``<img>``, a deferred stylesheet and its ``<noscript>`` copy).
+    Images count their ``src``, the largest candidate when there is a
+    ``srcset``, so the total is a worst case. Files on other hosts are
+    counted in ``external`` but not measured.
+    """
+
+    path: str
+    html: int
+    css: int = 0
+    js: int = 0
+    images: int = 0
+    external: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.html + self.css + self.js + self.images
+
+    def describe(self) -> str:
+        sizes = ", ".join(
+            f"{kind} {getattr(self, kind) / 1024:.1f}" for kind in ("html", "css", "js", "images")
+        )
+        return f"{self.path}: {self.total / 1024:.1f} KiB ({sizes}; {self.external} external)"
+
+
+def page_weight(path: Path, sizes: dict[str, int | None]) -> PageWeight:
+    """Measure ``path``; ``sizes`` caches file sizes across pages."""
+    data = path.read_bytes()
+    weight = PageWeight(path.relative_to(ROOT).as_posix(), len(data))
+    seen: set[str] = set()
+    for kind, url in page_resources(data.decode("utf-8")):
+        if url.startswith("data:"):
+            # Already part of the page's own bytes.
+            continue
+        url = url.partition("#")[0].partition("?")[0]
+        external = url.startswith(("http://", "https://", "//"))
+        if external:
+            target = url
+        else:
+            target = os.path.normpath(ROOT / url.lstrip("/") if url.startswith("/") else path.parent / url)
+        if target in seen:
+            continue
+        seen.add(target)
+        if external:
+            weight.external += 1
+            continue
+        if target not in sizes:
+            try:
+                sizes[target] = os.path.getsize(target)
+            except OSError:
+                sizes[target] = None
+        if sizes[target] is not None:
+            setattr(weight, kind, getattr(weight, kind) + sizes[target])
+    return weight
+
+
+def page_weights(paths: Iterable[Path]) -> list[PageWeight]:
+    """Weights of the pages in ``paths`` that exist, heaviest first."""
+    sizes: dict[str, int | None] = {}
+    weights = [page_weight(path, sizes) for path in paths if path.is_file()]
+    return sorted(weights, key=lambda weight: (-weight.total, weight.path))
+
+
+def build_images(posts: Iterable[Post], manifest: dict) -> dict[str, dict]:
+    """Size and resize the local featured images, keyed by root-relative path.
+
+    Images whose mtime and size match the manifest are not re-read; resized
+    copies carry the source hash in their name, so an edited image gets new
+    URLs and unused copies are removed.
+    """
+    previous: dict[str, dict] = manifest.get("images", {})
+    current: dict[str, dict] = {}
+    for src in sorted({normalize_index_image(post.featured_image) for post in posts}):
+        path = ROOT / src
+        if not src.startswith("assets/") or not path.is_file():
+            continue
+        stat = path.stat()
+        signature = [stat.st_mtime_ns, stat.st_size]
+        entry = previous.get(src)
+        if (
+            entry is None
+            or entry["stat"] != signature
+            or entry["resized"] != (Image is not None)
+            or not all((ROOT / variant).exists() for variant, _ in entry["variants"])
+        ):
+            entry = derive_image(path, signature)
+        current[src] = entry
+
+    outputs = {ROOT / variant for entry in current.values() for variant, _ in entry["variants"]}
+    for path in IMAGE_DIST_DIR.glob("*"):
+        if path not in outputs:
+            path.unlink()
+    manifest["images"] = current
+    return {
+        src: {"width": entry["width"], "height": entry["height"], "variants": entry["variants"]}
+        for src, entry in current.items()
+        if entry["width"]
+    }
+
 
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+MARKDOWN_URL_PATTERN = re.compile(r"\]\([^)]*\)")
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and strip accents, mirroring ``normalizeText`` in the JS."""
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def search_terms(text: str) -> Iterable[str]:
+    for token in TOKEN_PATTERN.findall(fold_text(text)):
+        if len(token) >= SEARCH_PREFIX_LENGTH and token not in SEARCH_STOPWORDS:
+            yield token
+
+
+def build_search_index(
+    posts: list[Post], layout: str = "flat"
+) -> tuple[dict, list[list[list[str]]], dict[str, dict[str, list[list[int]]]]]:
+    """Return the index table, the result records in chunks and the term postings by shard.
+
+    Postings are ``[doc, score]`` pairs sorted by descending score, where the
+    score sums ``SEARCH_FIELD_WEIGHTS`` over every occurrence of the term.
+    Record ``doc`` is entry ``doc % SEARCH_DOCS_PER_SHARD`` of chunk
+    ``doc // SEARCH_DOCS_PER_SHARD``.
+    """
+    docs: list[list[str]] = []
+    shards: dict[str, dict[str, list[list[int]]]] = {}
+    for doc_id, post in enumerate(posts):
+        docs.append(
+            [
+                f"posts/{post_path(post, layout)}",
+                post.title,
+                post.summary,
+                post.date,
+                post.category,
+                post.author,
+                normalize_post_image(post.featured_image),
+                post.featured_image_alt,
+            ]
+        )
+        scores: collections.Counter[str] = collections.Counter()
+        fields = {
+            "title": post.title,
+            "tags": " ".join(post.tags),
+            "summary": post.summary,
+            "body": MARKDOWN_URL_PATTERN.sub("]", post.load_body()),
+        }
+        for field, text in fields.items():
+            weight = SEARCH_FIELD_WEIGHTS[field]
+            for term in search_terms(text):
+                scores[term] += weight
+        for term, score in scores.items():
+            shard = shards.setdefault(term[:SEARCH_PREFIX_LENGTH], {})
+            shard.setdefault(term, []).append([doc_id, score])
+
+    for shard in shards.values():
+        for postings in shard.values():
+            postings.sort(key=lambda posting: (-posting[1], posting[0]))
+
+    table = {
+        "version": SEARCH_INDEX_VERSION,
+        "prefix": SEARCH_PREFIX_LENGTH,
+        "stopwords": sorted(SEARCH_STOPWORDS),
+        "fields": ["url", "title", "summary", "date", "category", "author", "image", "alt"],
+        "docs": len(docs),
+        "docsPerShard": SEARCH_DOCS_PER_SHARD,
+        "shards": sorted(shards),
+    }
+    chunks = [docs[start : start + SEARCH_DOCS_PER_SHARD] for start in range(0, len(docs), SEARCH_DOCS_PER_SHARD)]
+    return table, chunks, shards
+
+
+def search_categories(posts: list[Post]) -> dict:
+    """The category of every search record, for the search page's filter.
+
+    ``docs[doc]`` indexes ``slugs``, the slugs of the category listings (the
+    checkbox values), or is -1 for a post without a category. It is a file of
+    its own so searches that filter nothing never fetch it.
+    """
+    categories = [slugify(post.category.strip()) for post in posts]
+    slugs = sorted(set(categories) - {""})
+    positions = {slug: position for position, slug in enumerate(slugs)}
+    return {"slugs": slugs, "docs": [positions.get(slug, -1) for slug in categories]}
+
+
+def write_search_index(posts: list[Post], layout: str = "flat") -> int:
+    """Write ``data/search/`` and return how many files changed.
+
+    Unchanged shards keep their bytes (and mtimes) and shards for prefixes
+    or records that no longer exist are removed.
+    """
+    table, chunks, shards = build_search_index(posts, layout)
+    compact = {"ensure_ascii": False, "separators": (",", ":"), "sort_keys": True}
+    changed = int(write_text_if_changed(SEARCH_DIR / "index.json", json.dumps(table, **compact)))
+    categories = json.dumps(search_categories(posts), **compact)
+    changed += write_text_if_changed(SEARCH_DIR / "categories.json", categories)
+    names = {"index", "categories"}
+    for number, chunk in enumerate(chunks):
+        names.add(f"docs-{number}")
+        changed += write_text_if_changed(SEARCH_DIR / f"docs-{number}.json", json.dumps(chunk, **compact))
+    for prefix, shard in shards.items():
+        changed += write_text_if_changed(SEARCH_DIR / f"{prefix}.json", json.dumps(shard, **compact))
+    for path in SEARCH_DIR.glob("*.json"):
+        if path.stem not in names and path.stem not in shards:
+            path.unlink()
+            changed += 1
+    return changed
+
+
+def search_build_key(posts: list[Post], renderer: str) -> str:
+    return hash_json({"renderer": renderer, "posts": [[post.slug, post.source_hash] for post in posts]})
+
+
+@contextlib.contextmanager
+def open_atomic(path: Path) -> Iterator[TextIO]:
+    """Open ``path`` for streaming text writes that replace it only on success."""
+    partial = path.with_name(f".{path.name}")
+    try:
+        with partial.open("w", encoding="utf-8") as handle:
+            yield handle
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    os.replace(partial, path)
+
+
+def absolute_url(site_url: str, path: str) -> str:
+    if path.startswith(("http://", "https://")):
+        return path
+    return f"{site_url}{path}"
+
+
+def feed_entries(
+    posts: Iterable[Post], authors: dict[str, Author], site_url: str, layout: str = "flat"
+) -> Iterator[dict]:
+    """The fields ``build_post_json_ld`` publishes, with absolute URLs, per post."""
     for post in posts:
-        related_posts = select_related(post, published)
         author = authors.get(post.author)
-        html_output = render_post(post, related_posts, author)
-        output_path = POSTS_DIR / f"{post.slug}.html"
-        output_path.write_text(html_output, encoding="utf-8")
-        if post.status.lower() == "published" and post.source_path.exists():
-            post.source_path.unlink()
+        image = normalize_index_image(post.featured_image)
+        local_image = ROOT / image if image.startswith("assets/") else None
+        yield {
+            "id": absolute_url(site_url, f"posts/{post_path(post, layout)}"),
+            "title": post.title,
+            "summary": post.summary.strip() or post.title,
+            "image": absolute_url(site_url, image) if image else "",
+            "image_length": local_image.stat().st_size if local_image and local_image.is_file() else 0,
+            "published": post.datetime.replace(tzinfo=SITE_TIMEZONE),
+            "author": author.name if author else post.author,
+            "tags": [post.category, *post.tags] if post.category else list(post.tags),
+        }
+
+
+def write_rss(handle: TextIO, entries: Iterable[dict], site_url: str) -> None:
+    escape = html.escape
+    feed_url = absolute_url(site_url, FEED_FILES["rss"])
+    handle.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom" xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+        "<channel>\n"
+        f"  <title>{escape(SITE_TITLE)}</title>\n"
+        f"  <link>{escape(site_url)}</link>\n"
+        f"  <description>{escape(SITE_DESCRIPTION)}</description>\n"
+        f"  <language>{SITE_LANGUAGE}</language>\n"
+        f'  <atom:link href="{escape(feed_url)}" rel="self" type="application/rss+xml" />\n'
+    )
+    for entry in entries:
+        handle.write(
+            "  <item>\n"
+            f"    <title>{escape(entry['title'])}</title>\n"
+            f"    <link>{escape(entry['id'])}</link>\n"
+            f'    <guid isPermaLink="true">{escape(entry["id"])}</guid>\n'
+            f"    <pubDate>{email.utils.format_datetime(entry['published'])}</pubDate>\n"
+            f"    <dc:creator>{escape(entry['author'])}</dc:creator>\n"
+            f"    <description>{escape(entry['summary'])}</description>\n"
+        )
+        for tag in entry["tags"]:
+            handle.write(f"    <category>{escape(tag)}</category>\n")
+        if entry["image"]:
+            handle.write(
+                f'    <enclosure url="{escape(entry["image"])}" length="{entry["image_length"]}" '
+                f'type="{image_type(entry["image"])}" />\n'
+            )
+        handle.write("  </item>\n")
+    handle.write("</channel>\n</rss>\n")
+
+
+def write_atom(handle: TextIO, entries: Iterable[dict], site_url: str, updated: dt.datetime) -> None:
+    escape = html.escape
+    feed_url = absolute_url(site_url, FEED_FILES["atom"])
+    handle.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="{SITE_LANGUAGE}">\n'
+        f"  <title>{escape(SITE_TITLE)}</title>\n"
+        f"  <subtitle>{escape(SITE_DESCRIPTION)}</subtitle>\n"
+        f"  <id>{escape(site_url)}</id>\n"
+        f'  <link href="{escape(site_url)}" />\n'
+        f'  <link href="{escape(feed_url)}" rel="self" type="application/atom+xml" />\n'
+        f"  <updated>{updated.isoformat()}</updated>\n"
+    )
+    for entry in entries:
+        handle.write(
+            "  <entry>\n"
+            f"    <title>{escape(entry['title'])}</title>\n"
+            f'    <link href="{escape(entry["id"])}" />\n'
+            f"    <id>{escape(entry['id'])}</id>\n"
+            f"    <published>{entry['published'].isoformat()}</published>\n"
+            f"    <updated>{entry['published'].isoformat()}</updated>\n"
+            f"    <author><name>{escape(entry['author'])}</name></author>\n"
+            f"    <summary>{escape(entry['summary'])}</summary>\n"
+        )
+        for tag in entry["tags"]:
+            handle.write(f'    <category term="{escape(tag)}" />\n')
+        handle.write("  </entry>\n")
+    handle.write("</feed>\n")
+
+
+def write_json_feed(handle: TextIO, entries: Iterable[dict], site_url: str) -> None:
+    header = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": SITE_TITLE,
+        "home_page_url": site_url,
+        "feed_url": absolute_url(site_url, FEED_FILES["json"]),
+        "description": SITE_DESCRIPTION,
+        "language": SITE_LANGUAGE,
+    }
+    # Stream the items into the "items" array instead of dumping one big object.
+    handle.write("{\n")
+    for key, value in header.items():
+        handle.write(f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n")
+    handle.write('  "items": [')
+    for number, entry in enumerate(entries):
+        item = {
+            "id": entry["id"],
+            "url": entry["id"],
+            "title": entry["title"],
+            "content_text": entry["summary"],
+            "summary": entry["summary"],
+            "date_published": entry["published"].isoformat(),
+            "authors": [{"name": entry["author"]}],
+            "tags": entry["tags"],
+        }
+        if entry["image"]:
+            item["image"] = entry["image"]
+        handle.write(("," if number else "") + "\n    " + json.dumps(item, ensure_ascii=False))
+    handle.write("\n  ]\n}\n")
+
+
+def image_type(url: str) -> str:
+    suffix = url.rsplit(".", 1)[-1].lower()
+    return {"jpg": "image/jpeg", "jpeg": "image/jpeg", "svg": "image/svg+xml"}.get(suffix, f"image/{suffix}")
+
+
+def feed_build_key(posts: list[Post], authors_data: dict[str, dict], site_url: str, renderer: str) -> str:
+    return hash_json(
+        {
+            "renderer": renderer,
+            "site": site_url,
+            "posts": [[post.slug, post.source_hash, authors_data.get(post.author)] for post in posts],
+        }
+    )
+
+
+def write_feeds(feed_posts: list[Post], authors: dict[str, Author], site_url: str, layout: str = "flat") -> None:
+    """Write the RSS, Atom and JSON feeds for the newest published posts."""
+    updated = feed_posts[0].datetime.replace(tzinfo=SITE_TIMEZONE) if feed_posts else dt.datetime.now(SITE_TIMEZONE)
+    entries = functools.partial(feed_entries, feed_posts, authors, site_url, layout)
+    with open_atomic(ROOT / FEED_FILES["rss"]) as handle:
+        write_rss(handle, entries(), site_url)
+    with open_atomic(ROOT / FEED_FILES["atom"]) as handle:
+        write_atom(handle, entries(), site_url, updated)
+    with open_atomic(ROOT / FEED_FILES["json"]) as handle:
+        write_json_feed(handle, entries(), site_url)
+
+
+def sitemap_urls(
+    published: list[Post], posts: list[Post], listing_pages: Iterable[str], layout: str = "flat"
+) -> Iterator[tuple[str, str | None]]:
+    """Yield ``(path, lastmod)`` for every indexable page, relative to the site root.
+
+    Besides the published posts this covers posts that only exist as HTML
+    (published before the post store), the listing pages and the
+    hand-written pages.
+    """
+    yield "", published[0].date if published else None
+    for post in published:
+        yield f"posts/{post_path(post, layout)}", post.date
+    known = {post.slug for post in posts}
+    for path in sorted(POSTS_DIR.glob("*.html")):
+        if path.stem not in known:
+            yield f"posts/{path.name}", None
+    generated = set(listing_pages)
+    for name in sorted(generated):
+        yield f"pages/{name}", None
+    for path in sorted(PAGES_DIR.glob("*.html")):
+        if path.name not in generated and path.name not in SITEMAP_EXCLUDED_PAGES:
+            yield f"pages/{path.name}", None
+
+
+def sitemap_build_key(urls: Iterable[tuple[str, str | None]], site_url: str) -> str:
+    digest = hashlib.sha256(site_url.encode("utf-8"))
+    for path, lastmod in urls:
+        digest.update(f"{path}\t{lastmod}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_sitemaps(urls: Iterable[tuple[str, str | None]], site_url: str) -> int:
+    """Stream ``sitemap.xml``, split behind a sitemap index past the URL limit.
+
+    Returns the number of URLs written; numbered sitemaps left over from a
+    larger earlier site are removed.
+    """
+    escape = html.escape
+    urls = iter(urls)
+    written = 0
+    chunks = 0
+    while True:
+        chunk = list(itertools.islice(urls, SITEMAP_URL_LIMIT))
+        if not chunk and chunks:
+            break
+        chunks += 1
+        with open_atomic(ROOT / f"sitemap-{chunks}.xml") as handle:
+            handle.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            )
+            for path, lastmod in chunk:
+                handle.write(f"  <url><loc>{escape(absolute_url(site_url, path))}</loc>")
+                handle.write(f"<lastmod>{lastmod}</lastmod></url>\n" if lastmod else "</url>\n")
+            handle.write("</urlset>\n")
+        written += len(chunk)
+        if len(chunk) < SITEMAP_URL_LIMIT:
+            break
+
+    if chunks == 1:
+        os.replace(ROOT / "sitemap-1.xml", ROOT / "sitemap.xml")
+    else:
+        with open_atomic(ROOT / "sitemap.xml") as handle:
+            handle.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            )
+            for number in range(1, chunks + 1):
+                location = escape(absolute_url(site_url, f"sitemap-{number}.xml"))
+                handle.write(f"  <sitemap><loc>{location}</loc></sitemap>\n")
+            handle.write("</sitemapindex>\n")
+    numbered = set(range(1, chunks + 1)) if chunks > 1 else set()
+    for path in ROOT.glob("sitemap-*.xml"):
+        number = path.stem.removeprefix("sitemap-")
+        if number.isdigit() and int(number) not in numbered:
+            path.unlink()
+    return written
+
+
+def load_manifest() -> dict:
+    if not MANIFEST_PATH.exists():
+        return {"version": MANIFEST_VERSION, "posts": {}}
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return {"version": MANIFEST_VERSION, "posts": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "posts": {}}
+    manifest.setdefault("posts", {})
+    return manifest
+
+
+def save_manifest(manifest: dict) -> None:
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def renderer_fingerprint() -> str:
+    """Hash of everything besides the post itself that shapes a rendered page.
+
+    The build script is included so that changes to the renderers invalidate
+    previously generated outputs just like template edits do.
+    """
+    templates = [get_template(name).source for name in RENDER_TEMPLATES]
+    return hash_json([templates, hash_bytes(Path(__file__).read_bytes())])
+
+
+def post_build_key(
+    post: Post,
+    related_posts: list[Post],
+    authors_data: dict[str, dict],
+    renderer: str,
+    images: dict[str, dict],
+) -> str:
+    return hash_json(
+        {
+            "renderer": renderer,
+            "source": post.source_hash,
+            "author": authors_data.get(post.author),
+            "related": [[related.slug, related.source_hash] for related in related_posts],
+            "images": images,
+        }
+    )
 
+
+# The related section comes pre-rendered from the fragment cache and the
+# images entry only holds the post's own featured image, so jobs stay small
+# when they are sent to worker processes.
+RenderJob = tuple[Post, str, "Author | None", dict[str, dict], str]
+# A post whose page is out of date: where it goes, its build key and its
+# related posts.
+PendingPage = tuple[Post, Path, str, list[Post]]
+
+
+@dataclasses.dataclass(slots=True)
+class RenderResult:
+    html: str | None
+    error: str | None
+    markdown_seconds: float = 0.0
+    seconds: float = 0.0
+
+
+def render_job(job: RenderJob) -> RenderResult:
+    """Render one post and time it, in whichever process runs the job.
+
+    Errors are returned instead of raised so a worker failure is reported
+    against its post without aborting the rest of the batch.
+    """
+    post, related_section, author, images, layout = job
+    started = time.perf_counter()
+    try:
+        body_html = render_body_markdown(post.load_body())
+        markdown_seconds = time.perf_counter() - started
+        html_output = render_post(
+            post, [], author, body_html=body_html, images=images, related_section=related_section, layout=layout
+        )
+    except Exception as exc:  # noqa: BLE001 - reported per post by the caller
+        return RenderResult(None, f"{type(exc).__name__}: {exc}", seconds=time.perf_counter() - started)
+    return RenderResult(html_output, None, markdown_seconds, time.perf_counter() - started)
+
+
+def render_posts(jobs: list[RenderJob], workers: int = 1) -> list[RenderResult]:
+    """Render jobs serially or across a process pool, preserving job order."""
+    if workers <= 1 or len(jobs) <= 1:
+        return [render_job(job) for job in jobs]
+
+    workers = min(workers, len(jobs))
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_root, initargs=(ROOT,)) as executor:
+        return list(executor.map(render_job, jobs, chunksize=chunksize))
+
+
+class BuildMetrics:
+    """Wall time and item counts per build stage, plus per-post outliers.
+
+    Stage times are measured in the main process; ``render_post`` and
+    ``render_body_markdown`` add up the times measured inside each job, so with
+    ``--jobs`` they are CPU time across workers rather than wall time.
+    """
+
+    OUTLIERS = 5
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: dict[str, dict[str, float]] = {}
+        self.post_seconds: list[tuple[float, str]] = []
+        self.heaviest_pages: list[PageWeight] = []
+
+    def add(self, name: str, seconds: float, count: int = 1) -> None:
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "count": 0})
+        stage["seconds"] += seconds
+        stage["count"] += count
+
+    @contextlib.contextmanager
+    def stage(self, name: str, count: int = 1) -> Iterator[dict[str, int]]:
+        """Time the block as stage ``name``.
+
+        A block that only learns its count as it runs sets ``["count"]`` on
+        the dict it is given.
+        """
+        started = time.perf_counter()
+        tally = {"count": count}
+        try:
+            yield tally
+        finally:
+            self.add(name, time.perf_counter() - started, tally["count"])
+
+    def record_render(self, slug: str, result: RenderResult) -> None:
+        self.add("render_body_markdown", result.markdown_seconds)
+        self.add("render_post", result.seconds)
+        self.post_seconds.append((result.seconds, slug))
+
+    @staticmethod
+    def peak_memory_bytes() -> int | None:
+        if resource is None:
+            return None
+        # ru_maxrss is KiB on Linux and bytes on macOS.
+        scale = 1 if sys.platform == "darwin" else 1024
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return max(own, children) * scale
+
+    def report(self) -> dict:
+        slowest = heapq.nlargest(self.OUTLIERS, self.post_seconds)
+        return {
+            "timestamp": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "peak_memory_bytes": self.peak_memory_bytes(),
+            "stages": {
+                name: {"seconds": round(stage["seconds"], 6), "count": int(stage["count"])}
+                for name, stage in self.stages.items()
+            },
+            "slowest_posts": [{"slug": slug, "seconds": round(seconds, 6)} for seconds, slug in slowest],
+            "heaviest_pages": [
+                {**dataclasses.asdict(weight), "total": weight.total} for weight in self.heaviest_pages
+            ],
+        }
+
+    def format_table(self) -> str:
+        report = self.report()
+        lines = [f"{'etapa':<22} {'segundos':>10} {'cantidad':>9}"]
+        for name, stage in report["stages"].items():
+            lines.append(f"{name:<22} {stage['seconds']:>10.4f} {stage['count']:>9}")
+        lines.append(f"{'total':<22} {report['wall_seconds']:>10.4f}")
+        if report["peak_memory_bytes"] is not None:
+            lines.append(f"memoria pico: {report['peak_memory_bytes'] / 2**20:.1f} MiB")
+        for outlier in report["slowest_posts"]:
+            lines.append(f"  lento: {outlier['slug']} {outlier['seconds']:.4f}s")
+        for weight in self.heaviest_pages:
+            lines.append(f"  pesada: {weight.describe()}")
+        return "\n".join(lines)
+
+
+class BuildError(Exception):
+    """Raised when some outputs could not be generated."""
+
+
+@dataclasses.dataclass
+class ChangeSet:
+    """What changed on disk between two polls of ``--watch``."""
+
+    posts: set[str] = dataclasses.field(default_factory=set)
+    authors: set[str] = dataclasses.field(default_factory=set)
+    templates: bool = False
+    index: bool = False
+    assets: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.posts or self.authors or self.templates or self.index or self.assets)
+
+
+def affected_posts(
+    changes: ChangeSet,
+    manifest: dict,
+    posts: list[Post],
+    related_index: RelatedIndex | SimilarityIndex,
+) -> set[str] | None:
+    """Slugs whose page may need re-rendering, or ``None`` for all of them.
+
+    Walks the dependency graph recorded in the manifest: a changed post
+    affects itself, every post whose related section listed it and every post
+    the related index says may now list its new version; a changed author
+    entry affects every post by that author.
+    """
+    if changes.templates or changes.assets:
+        return None
+
+    dependents: dict[str, set[str]] = {}
+    for slug, entry in manifest["posts"].items():
+        for related_slug in entry.get("related", ()):
+            dependents.setdefault(related_slug, set()).add(slug)
+
+    by_slug = {post.slug: post for post in posts}
+    affected = set(changes.posts)
+    for slug in changes.posts:
+        affected |= dependents.get(slug, set())
+        post = by_slug.get(slug)
+        if post is None:
+            continue
+        affected |= related_index.neighbours(post)
+    affected.update(post.slug for post in posts if post.author in changes.authors)
+    return affected
+
+
+def parse_sources(paths: list[Path]) -> tuple[list[Post], list[str]]:
+    """Parse ``paths``; return the posts and the names of the sources that could not be read.
+
+    An unreadable source is reported and skipped so the rest still build;
+    ``build`` fails at the end instead.
+    """
+    sources: list[Post] = []
+    unreadable: list[str] = []
+    for path in paths:
+        try:
+            sources.append(parse_post(path, lazy_body=True))
+        except BuildError as exc:
+            unreadable.append(path.name)
+            print(f"error: {exc}", file=sys.stderr)
+    return sources, unreadable
+
+
+def sync_store(sources: list[Post], remove: Iterable[str], prune: bool) -> list[Post]:
+    """Store changed ``sources``, drop the ``remove`` slugs and return every stored post.
+
+    With ``prune`` stored drafts whose source is gone are dropped as well.
+    """
+    with PostStore() as store:
+        stored_hashes = store.source_hashes()
+        if remove:
+            remove = set(remove)
+            sourced = sorted(post.source_path.name for post in sources if post.slug in remove)
+            if sourced:
+                raise BuildError(f"cannot remove posts that still have a source: {', '.join(sourced)}")
+            unknown = sorted(remove - stored_hashes.keys())
+            if unknown:
+                raise BuildError(f"no stored post to remove: {', '.join(unknown)}")
+            store.remove(remove)
+        store.upsert(post for post in sources if stored_hashes.get(post.slug) != post.source_hash)
+        if prune:
+            store.prune_drafts({post.slug for post in sources})
+        return store.load_all()
+
+
+def related_engine(
+    related: str, posts: list[Post], published: list[Post], metrics: BuildMetrics
+) -> RelatedIndex | SimilarityIndex:
+    """The related posts index ``related`` names: ``"tags"`` or ``"similar"``."""
+    with metrics.stage("related_index", len(published)):
+        related_index = RelatedIndex(published)
+    if related != "similar":
+        return related_index
+    with metrics.stage("signatures", len(posts)):
+        signatures = post_signatures(posts)
+    with metrics.stage("similarity_index", len(published)):
+        return SimilarityIndex(published, signatures, related_index)
+
+
+def plan_post_pages(
+    posts: list[Post],
+    previous_posts: dict[str, dict],
+    considered: set[str] | None,
+    related_index: RelatedIndex | SimilarityIndex,
+    images: dict[str, dict],
+    authors_data: dict[str, dict],
+    page_renderer: str,
+    layout: str,
+    metrics: BuildMetrics,
+) -> tuple[dict[str, dict], list[PendingPage]]:
+    """Split ``posts`` into manifest entries still current and pages to render.
+
+    Only posts in ``considered`` (all of them when it is ``None``) are
+    re-keyed; ``select_related`` times the related selection alone.
+    """
+    current_posts: dict[str, dict] = {}
+    pending: list[PendingPage] = []
+    select_seconds = 0.0
+    selected = 0
+    for post in posts:
+        entry = previous_posts.get(post.slug)
+        output_path = POSTS_DIR / post_path(post, layout)
+        if considered is not None and post.slug not in considered and entry and output_path.exists():
+            current_posts[post.slug] = entry
+            continue
+        started = time.perf_counter()
+        related_posts = related_index.select(post)
+        select_seconds += time.perf_counter() - started
+        selected += 1
+        job_images = post_images([post, *related_posts], images)
+        key = post_build_key(post, related_posts, authors_data, page_renderer, job_images)
+        if entry and entry.get("key") == key and output_path.exists():
+            current_posts[post.slug] = entry
+            continue
+        pending.append((post, output_path, key, related_posts))
+    metrics.add("select_related", select_seconds, selected)
+    return current_posts, pending
+
+
+def render_jobs(
+    pending: list[PendingPage], authors: dict[str, Author], images: dict[str, dict], fragments: FragmentCache, layout: str
+) -> list[RenderJob]:
+    """The render job of each pending page, with its related section from the fragment cache."""
+    return [
+        (
+            post,
+            render_related_section(related_posts, images, fragments, layout),
+            authors.get(post.author),
+            post_images([post], images),
+            layout,
+        )
+        for post, _, _, related_posts in pending
+    ]
+
+
+def write_post_pages(
+    pending: list[PendingPage],
+    results: list[RenderResult],
+    current_posts: dict[str, dict],
+    assets: dict[str, str],
+    styles: PageStyles,
+    layout: str,
+    metrics: BuildMetrics,
+) -> tuple[list[str], list[tuple[Post, str]]]:
+    """Write each rendered page and its manifest entry; return the rendered slugs and the failures."""
+    failures: list[tuple[Post, str]] = []
+    rendered: list[str] = []
+    write_seconds = 0.0
+    for (post, output_path, key, related_posts), result in zip(pending, results):
+        metrics.record_render(post.slug, result)
+        if result.error is not None:
+            failures.append((post, result.error))
+            continue
+        started = time.perf_counter()
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        page_html = style_page(rewrite_asset_urls(result.html, assets), styles, post_root(layout))
+        output_path.write_text(page_html, encoding="utf-8")
+        write_seconds += time.perf_counter() - started
+        rendered.append(post.slug)
+        current_posts[post.slug] = {
+            "key": key,
+            "path": output_path.relative_to(POSTS_DIR).as_posix(),
+            "source": post.source_hash,
+            "author": post.author,
+            "related": [related.slug for related in related_posts],
+        }
+    metrics.add("write", write_seconds, len(rendered))
+    return rendered, failures
+
+
+def remove_moved_pages(
+    posts: list[Post],
+    rendered: list[str],
+    current_posts: dict[str, dict],
+    previous_posts: dict[str, dict],
+    stubs: dict[str, Post],
+) -> int:
+    """Delete the pages rendered posts left behind at another path; return how many.
+
+    A post changes path only with its date or the layout, and either
+    re-renders it. Paths a redirect stub takes over are kept.
+    """
+    moved = 0
+    rendered_slugs = set(rendered)
+    for post in posts:
+        if post.slug not in rendered_slugs:
+            continue
+        current = current_posts[post.slug]["path"]
+        stale = {post_path(post, other) for other in POST_LAYOUT_DEPTHS}
+        stale.add(previous_posts.get(post.slug, {}).get("path", current))
+        for path in stale - {current} - stubs.keys():
+            if (POSTS_DIR / path).exists():
+                remove_post_page(POSTS_DIR / path)
+                moved += 1
+    return moved
+
+
+def remove_gone_pages(previous_posts: dict[str, dict], current_posts: dict[str, dict]) -> int:
+    """Delete the pages of posts that left the store; return how many.
+
+    That covers removed and renamed posts and drafts whose source is gone.
+    """
+    gone = previous_posts.keys() - current_posts.keys()
+    for slug in gone:
+        remove_post_page(POSTS_DIR / previous_posts[slug].get("path", f"{slug}.html"))
+    return len(gone)
+
+
+def update_index(
+    published: list[Post], listings: list[Listing], images: dict[str, dict], fragments: FragmentCache, layout: str
+) -> list[Path]:
+    """Refresh the generated regions of the index and the search page; return the files rewritten.
+
+    Every region is re-rendered (cards come from the fragment cache) and
+    files whose bytes come out the same are not written. Regions that come
+    out empty keep what is there: on a checkout whose posts were never
+    imported into the store that is the hand-maintained markup.
+    """
     portada_post = published[0] if published else None
-    stream_posts = (published[1:] if portada_post else published)[:5]
-    stream_html = render_stream(stream_posts)
-    portada_html = render_portada(portada_post) if portada_post else None
-    update_index(stream_html, portada_html)
+    stream_posts = (published[1:] if portada_post else published)[:INDEX_STREAM_SIZE]
+    index_regions = {
+        "posts": render_stream(stream_posts, "", images, fragments, layout),
+        "categories": render_sidebar_categories(listings),
+        "tags": render_sidebar_tags(listings),
+    }
+    if portada_post:
+        index_regions["portada"] = fragments.card(
+            portada_post, "hero", images, functools.partial(render_portada, portada_post, images, layout)
+        )
+    updates = {INDEX_PATH: {name: text for name, text in index_regions.items() if text}}
+    if portada_post:
+        # Empty here just means the newest post has no image to preload.
+        updates[INDEX_PATH]["preload"] = render_portada_preload(portada_post, images)
+    search_page = PAGES_DIR / "search.html"
+    search_categories = render_search_categories(listings)
+    if search_page.exists() and search_categories:
+        updates[search_page] = {"search-categories": search_categories}
+    return update_regions(updates)
+
+
+def static_pages(manifest: dict, current_posts: dict[str, dict], stubs: dict[str, Post]) -> list[Path]:
+    """Pages the build never re-renders: hand-written ones and posts published before the store."""
+    generated = {PAGES_DIR / name for name in manifest["pages"]}
+    generated.update(POSTS_DIR / entry.get("path", f"{slug}.html") for slug, entry in current_posts.items())
+    generated.update(POSTS_DIR / name for name in stubs)
+    pages = [INDEX_PATH, *PAGES_DIR.glob("*.html"), *POSTS_DIR.glob("*.html")]
+    return [path for path in pages if path not in generated]
+
+
+def check_page_budget(manifest: dict, page_budget: int, metrics: BuildMetrics) -> None:
+    """Weigh every generated page; BuildError when one is heavier than ``page_budget`` bytes."""
+    pages = [INDEX_PATH, *(PAGES_DIR / name for name in manifest["pages"])]
+    pages += (POSTS_DIR / entry.get("path", f"{slug}.html") for slug, entry in manifest["posts"].items())
+    with metrics.stage("page_weight", len(pages)):
+        weights = page_weights(pages)
+    metrics.heaviest_pages = weights[: metrics.OUTLIERS]
+    over = [weight for weight in weights if weight.total > page_budget]
+    if over:
+        for weight in over:
+            print(f"error: {weight.describe()}", file=sys.stderr)
+        raise BuildError(
+            f"{len(over)} page(s) exceed the {page_budget / 1024:g} KiB weight budget; no sources were removed."
+        )
+
+
+def build(
+    force: bool = False,
+    workers: int = 1,
+    changes: ChangeSet | None = None,
+    keep_sources: bool = False,
+    metrics: BuildMetrics | None = None,
+    compress: bool = False,
+    site_url: str = SITE_URL,
+    related: str = "tags",
+    critical_css: bool = False,
+    icon_subset: bool = False,
+    layout: str = "flat",
+    page_budget: int | None = None,
+    remove: Iterable[str] = (),
+) -> list[str]:
+    """Run one build and return the slugs of the post pages it rendered.
+
+    With ``changes`` only the posts reachable from them in the dependency
+    graph are re-checked; the index, listings and search index are always
+    re-keyed since they are cheap to compare. ``related`` picks the related
+    posts engine: ``"tags"`` or ``"similar"`` (see ``SimilarityIndex``);
+    ``critical_css`` inlines each page's critical CSS (see ``style_page``),
+    ``icon_subset`` serves only the icons the site uses (see ``build_icons``)
+    and ``layout`` picks where post pages go (see ``POST_LAYOUT_DEPTHS``).
+    With ``page_budget`` (bytes) every generated page is weighed (see
+    ``PageWeight``) and the build fails if any of them is heavier.
+    ``remove`` lists slugs to drop from the store; like any post that
+    leaves the store, their pages are deleted.
+
+    Each stage runs under ``metrics`` with the name it is reported as.
+    """
+    metrics = metrics or BuildMetrics()
+    authors_data = load_authors_data()
+    authors = load_authors(authors_data)
+    manifest = {"version": MANIFEST_VERSION, "posts": {}} if force else load_manifest()
+    with metrics.stage("assets"):
+        assets = build_assets(manifest)
+    with metrics.stage("icons"):
+        styles = PageStyles(icons=build_icons(manifest, icon_subset))
+    critical_path = ASSETS_DIR / CRITICAL_STYLESHEET
+    if critical_css and critical_path.exists():
+        with metrics.stage("critical_css"):
+            styles.critical = CriticalCss(critical_path.read_text(encoding="utf-8"))
+    renderer = renderer_fingerprint()
+    if layout != "flat":
+        # Every post URL, and so every page, feed and index, depends on it.
+        renderer = hash_json([renderer, layout])
+    # Pages embed the fingerprinted asset names and the critical CSS, so they
+    # re-render when either changes.
+    page_renderer = hash_json([renderer, assets, styles.key])
+
+    with metrics.stage("glob"):
+        source_paths = sorted(POSTS_DIR.glob("*.txt"))
+    with metrics.stage("parse_post", len(source_paths)):
+        sources, unreadable = parse_sources(source_paths)
+    with metrics.stage("post_store"):
+        # An unreadable source may be a draft whose slug we cannot see.
+        posts = sync_store(sources, remove, prune=not unreadable)
+    with metrics.stage("sort", len(posts)):
+        posts_sorted = sorted(posts, key=lambda post: post.datetime, reverse=True)
+    with metrics.stage("images"):
+        images = build_images(posts, manifest)
+    published = [post for post in posts_sorted if post.status.lower() == "published"]
+    related_index = related_engine(related, posts, published, metrics)
+
+    previous_posts: dict[str, dict] = manifest["posts"]
+    considered = affected_posts(changes, manifest, posts, related_index) if changes else None
+    current_posts, pending = plan_post_pages(
+        posts, previous_posts, considered, related_index, images, authors_data, page_renderer, layout, metrics
+    )
+    fragments = FragmentCache(page_renderer)
+    with metrics.stage("related_sections", len(pending)):
+        jobs = render_jobs(pending, authors, images, fragments, layout)
+    with metrics.stage("render_wall", len(jobs)):
+        results = render_posts(jobs, workers)
+    rendered, failures = write_post_pages(pending, results, current_posts, assets, styles, layout, metrics)
+
+    stubs = redirect_stubs(published, layout, manifest)
+    with metrics.stage("moved", 0) as stage:
+        stage["count"] = remove_moved_pages(posts, rendered, current_posts, previous_posts, stubs)
+    manifest["posts"] = current_posts
+    if failures:
+        fragments.save({post.slug for post in posts})
+        # Keep every source on disk: nothing is deleted until the whole
+        # build has succeeded, so the failed posts can be fixed and rebuilt.
+        save_manifest(manifest)
+        for post, error in failures:
+            print(f"error: {post.source_path.name}: {error}", file=sys.stderr)
+        raise BuildError(f"{len(failures)} post(s) failed to render; no sources were removed.")
+    with metrics.stage("removed", 0) as stage:
+        stage["count"] = remove_gone_pages(previous_posts, current_posts)
+    with metrics.stage("redirect_stubs", 0) as stage:
+        pages = {entry["path"] for entry in current_posts.values()}
+        stage["count"] = write_redirect_stubs(stubs, layout, manifest, renderer, pages)
+
+    with metrics.stage("listing_pages"):
+        listings = write_listing_pages(published, manifest, page_renderer, assets, images, fragments, styles, layout)
+    with metrics.stage("update_index"):
+        rewritten = update_index(published, listings, images, fragments, layout)
+    with metrics.stage("fragments_save", len(fragments.pending)):
+        fragments.save({post.slug for post in posts})
+
+    styles_key = hash_json([renderer, assets, styles.key])
+    if manifest.get("styles") != styles_key:
+        # Pages the build never re-renders only need their asset and
+        # stylesheet links to follow the hashes and the critical CSS.
+        with metrics.stage("asset_links"):
+            rewrite_asset_references(static_pages(manifest, current_posts, stubs), assets, styles)
+    elif styles.critical and rewritten:
+        # New region content may use rules the inlined CSS lacks.
+        with metrics.stage("asset_links", len(rewritten)):
+            rewrite_asset_references(rewritten, assets, styles)
+    manifest["styles"] = styles_key
+
+    search_key = search_build_key(published, renderer)
+    if manifest.get("search") != search_key or not (SEARCH_DIR / "index.json").exists():
+        with metrics.stage("search_index", len(published)):
+            write_search_index(published, layout)
+    manifest["search"] = search_key
+
+    site_url = site_url.rstrip("/") + "/"
+    feed_posts = published[:FEED_SIZE]
+    feed_key = feed_build_key(feed_posts, authors_data, site_url, renderer)
+    if manifest.get("feeds") != feed_key or not all((ROOT / name).exists() for name in FEED_FILES.values()):
+        with metrics.stage("feeds", len(feed_posts)):
+            write_feeds(feed_posts, authors, site_url, layout)
+    manifest["feeds"] = feed_key
+
+    urls = functools.partial(sitemap_urls, published, posts, manifest["pages"], layout)
+    sitemap_key = sitemap_build_key(urls(), site_url)
+    if manifest.get("sitemap") != sitemap_key or not (ROOT / "sitemap.xml").exists():
+        with metrics.stage("sitemap"):
+            write_sitemaps(urls(), site_url)
+    manifest["sitemap"] = sitemap_key
+
+    if compress:
+        with metrics.stage("compress", 0) as stage:
+            stage["count"] = compress_outputs(manifest, workers)
+    else:
+        manifest.pop("compressed", None)
+        with metrics.stage("compress_cleanup"):
+            remove_compressed_copies()
+    save_manifest(manifest)
+
+    if page_budget is not None:
+        check_page_budget(manifest, page_budget, metrics)
+    if not keep_sources:
+        for post in sources:
+            if post.status.lower() == "published" and post.source_path.exists():
+                post.source_path.unlink()
+    if unreadable:
+        raise BuildError(f"{len(unreadable)} source(s) could not be read and were skipped: {', '.join(unreadable)}")
+    return rendered
+
+
+class SourceWatcher:
+    """Polls the build inputs and reports content changes as a ``ChangeSet``.
+
+    A file counts as changed when its mtime or size moved *and* its hash
+    differs, so editors that rewrite files unchanged do not trigger builds.
+    """
+
+    def __init__(self) -> None:
+        self.stats: dict[Path, tuple[int, int]] = {}
+        self.hashes: dict[Path, str] = {}
+        self.post_slugs: dict[Path, str] = {}
+        self.authors_data = load_authors_data()
+        for path in self.watched_paths():
+            self.record(path)
+
+    @staticmethod
+    def watched_paths() -> list[Path]:
+        paths = sorted(POSTS_DIR.glob("*.txt")) + sorted(TEMPLATES_DIR.glob("*"))
+        for kind in ASSET_KINDS:
+            paths += sorted((ASSETS_DIR / kind).glob(f"*.{kind}"))
+        return paths + [path for path in (AUTHORS_PATH, INDEX_PATH) if path.exists()]
+
+    def record(self, path: Path) -> bool:
+        """Refresh the stored state of ``path``; return whether its content changed."""
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self.stats.get(path) == signature:
+            return False
+        self.stats[path] = signature
+        digest = hash_bytes(path.read_bytes())
+        if self.hashes.get(path) == digest:
+            return False
+        self.hashes[path] = digest
+        if path.suffix == ".txt" and path.parent == POSTS_DIR:
+            try:
+                self.post_slugs[path] = parse_post(path, lazy_body=True).slug
+            except BuildError as exc:
+                # Most likely saved halfway; the next save is a change again.
+                print(f"error: {exc}", file=sys.stderr)
+                del self.hashes[path]
+                return False
+        return True
+
+    def poll(self) -> ChangeSet:
+        changes = ChangeSet()
+        current = self.watched_paths()
+        for path in current:
+            previous_slug = self.post_slugs.get(path)
+            if not self.record(path):
+                continue
+            if path == AUTHORS_PATH:
+                authors_data = load_authors_data()
+                for key in authors_data.keys() | self.authors_data.keys():
+                    if authors_data.get(key) != self.authors_data.get(key):
+                        changes.authors.add(key)
+                self.authors_data = authors_data
+            elif path == INDEX_PATH:
+                changes.index = True
+            elif path.parent == TEMPLATES_DIR:
+                changes.templates = True
+            elif path.parent.parent == ASSETS_DIR:
+                changes.assets = True
+            else:
+                changes.posts.add(self.post_slugs[path])
+                if previous_slug:
+                    changes.posts.add(previous_slug)
+
+        for path in self.stats.keys() - set(current):
+            del self.stats[path]
+            self.hashes.pop(path, None)
+            slug = self.post_slugs.pop(path, None)
+            if slug:
+                changes.posts.add(slug)
+            elif path.parent.parent == ASSETS_DIR:
+                changes.assets = True
+        return changes
+
+
+def watch(
+    workers: int,
+    interval: float,
+    compress: bool = False,
+    site_url: str = SITE_URL,
+    related: str = "tags",
+    critical_css: bool = False,
+    icon_subset: bool = False,
+    layout: str = "flat",
+    page_budget: int | None = None,
+) -> None:
+    print(
+        f"Vigilando {POSTS_DIR.name}/, {TEMPLATES_DIR.name}/, {ASSETS_DIR.name}/, "
+        f"{AUTHORS_PATH.name} e {INDEX_PATH.name}…"
+    )
+    watcher = SourceWatcher()
+    while True:
+        time.sleep(interval)
+        changes = watcher.poll()
+        if not changes:
+            continue
+        if changes.templates:
+            get_template.cache_clear()
+        try:
+            rendered = build(
+                workers=workers,
+                changes=changes,
+                keep_sources=True,
+                compress=compress,
+                site_url=site_url,
+                related=related,
+                critical_css=critical_css,
+                icon_subset=icon_subset,
+                layout=layout,
+                page_budget=page_budget,
+            )
+        except (BuildError, StoreError) as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            rendered = None
+        # Our own index.html rewrite must not count as an edit, even when the
+        # build failed after making it (a skipped source fails it last).
+        watcher.record(INDEX_PATH)
+        if rendered is not None:
+            print(f"Regenerados {len(rendered)} post(s): {', '.join(rendered) or '-'}")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Genera las páginas de posts y actualiza index.html.")
+    parser.add_argument(
+        "--root",
+        type=Path,
+        metavar="RUTA",
+        help="Raíz del sitio a construir (por defecto, la del repositorio).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignora el manifiesto de build y vuelve a generar todas las salidas.",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Procesos para renderizar posts (0 usa todos los núcleos).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Muestra en stderr el tiempo y la cantidad de cada etapa del build.",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=Path,
+        metavar="RUTA",
+        help="Añade a RUTA una línea JSON con las métricas del build.",
+    )
+    parser.add_argument(
+        "--site-url",
+        default=SITE_URL,
+        metavar="URL",
+        help=f"URL pública del sitio para feeds y sitemaps (por defecto, {SITE_URL}).",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Escribe copias .gz (y .br si brotli está instalado) de cada HTML, CSS, JS y JSON generado. "
+        "Sin esta opción se borran las copias de builds anteriores.",
+    )
+    parser.add_argument(
+        "--critical-css",
+        action="store_true",
+        help="Incrusta en cada página las reglas de style.css que usa y carga las hojas de estilo "
+        "sin bloquear el renderizado.",
+    )
+    parser.add_argument(
+        "--icon-subset",
+        action="store_true",
+        help="Sirve solo los iconos de bootstrap-icons que usa el sitio, recortados de la copia en "
+        "assets/vendor/bootstrap-icons (la descarga scripts/fetch_icons.py). Sin esta opción las páginas "
+        "cargan la hoja completa del CDN.",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=tuple(POST_LAYOUT_DEPTHS),
+        default="flat",
+        help="Dónde escribir los posts: posts/slug.html (flat, por defecto) o posts/AAAA/MM/slug.html (dated), "
+        "con páginas que redirigen desde las URL planas.",
+    )
+    parser.add_argument(
+        "--page-budget",
+        type=float,
+        metavar="KIB",
+        help="Falla el build si alguna página generada, sumando el CSS, JS e imágenes locales que carga, "
+        "pesa más de KIB kibibytes.",
+    )
+    parser.add_argument(
+        "--related",
+        choices=RELATED_ENGINES,
+        default="tags",
+        help="Cómo elegir los posts relacionados: por etiquetas compartidas (por defecto) "
+        "o por similitud de título y texto.",
+    )
+    parser.add_argument(
+        "--remove",
+        action="append",
+        default=[],
+        metavar="SLUG",
+        help="Borra del almacén el post con ese slug y su página (repetible). "
+        "Su fuente no debe seguir en posts/.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Tras el build inicial, vigila las fuentes y regenera solo lo afectado. "
+        "En este modo no se borran las fuentes publicadas.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        metavar="SEGUNDOS",
+        help="Intervalo de sondeo para --watch.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.root:
+        set_root(args.root)
+    workers = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    metrics = BuildMetrics()
+    page_budget = int(args.page_budget * 1024) if args.page_budget is not None else None
+    try:
+        build(
+            force=args.force,
+            workers=workers,
+            keep_sources=args.watch,
+            metrics=metrics,
+            compress=args.compress,
+            site_url=args.site_url,
+            related=args.related,
+            critical_css=args.critical_css,
+            icon_subset=args.icon_subset,
+            layout=args.layout,
+            page_budget=page_budget,
+            remove=args.remove,
+        )
+    except StoreError as exc:
+        raise SystemExit(str(exc)) from None
+    except BuildError as exc:
+        if not args.watch:
+            raise SystemExit(str(exc)) from None
+        # Keep watching: the next save may well fix it.
+        print(f"error: {exc}", file=sys.stderr)
+    finally:
+        if args.profile:
+            print(metrics.format_table(), file=sys.stderr)
+        if args.metrics_json:
+            args.metrics_json.parent.mkdir(parents=True, exist_ok=True)
+            with args.metrics_json.open("a", encoding="utf-8") as handle:
+                handle.write(json.dumps(metrics.report(), ensure_ascii=False) + "\n")
+    if args.watch:
+        try:
+            watch(
+                workers,
+                args.interval,
+                args.compress,
+                args.site_url,
+                args.related,
+                args.critical_css,
+                args.icon_subset,
+                args.layout,
+                page_budget,
+            )
+        except KeyboardInterrupt:
+            pass
 
 
 if __name__ == "__main__":
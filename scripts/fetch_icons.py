@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Download the bootstrap-icons stylesheet and fonts into assets/vendor/.
+
+build_posts.py --icon-subset serves only the icons the site uses, cut from
+the copy vendored there; without it every page loads the whole CDN
+stylesheet. Run this once (and again after changing ICONS_VERSION in
+build_posts.py, which also pins the CDN link), then commit the files it
+writes.
+"""
+from __future__ import annotations
+
+import argparse
+import urllib.request
+from pathlib import Path
+
+import build_posts
+from build_posts import ICONS_VERSION
+
+PACKAGE_URL = "https://cdn.jsdelivr.net/npm/bootstrap-icons@{version}/font/{name}"
+FILES = ("bootstrap-icons.css", "fonts/bootstrap-icons.woff2", "fonts/bootstrap-icons.woff")
+
+
+def fetch_icons(version: str = ICONS_VERSION) -> list[str]:
+    """Write every file in ``FILES`` under ``ICONS_VENDOR_DIR`` and return their names."""
+    for name in FILES:
+        with urllib.request.urlopen(PACKAGE_URL.format(version=version, name=name), timeout=60) as response:
+            data = response.read()
+        path = build_posts.ICONS_VENDOR_DIR / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        build_posts.write_bytes_atomic(path, data)
+    return list(FILES)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--version",
+        default=ICONS_VERSION,
+        help=f"Versión de bootstrap-icons a descargar (por defecto, {ICONS_VERSION}).",
+    )
+    parser.add_argument("--root", type=Path, metavar="RUTA", help="Raíz del sitio (por defecto, la del repositorio).")
+    args = parser.parse_args()
+
+    if args.root:
+        build_posts.set_root(args.root)
+    names = fetch_icons(args.version)
+    print(f"bootstrap-icons {args.version}: {', '.join(names)} en {build_posts.ICONS_VENDOR_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Write a reproducible synthetic corpus of post sources for benchmarks.
+
+Posts use the ``templates/post_template.txt`` field format, with tags drawn
+from a Zipf-like vocabulary (a few very popular tags and a long tail), a
+weighted category mix and log-normally distributed body sizes that exercise
+every Markdown feature the renderer supports.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import random
+from pathlib import Path
+
+from build_posts import render_source
+
+POPULAR_TAGS = [
+    "tecnología", "IA", "videojuegos", "hardware", "móviles", "ciencia", "Nintendo", "Apple", "Android",
+    "software libre", "ciberseguridad", "redes sociales", "streaming", "wearables", "espacio", "energía",
+    "autos eléctricos", "privacidad", "chips", "Latinoamérica",
+]
+LONG_TAIL_TAGS = 3000
+CATEGORIES = {"Tecnología": 6, "IA": 3, "Entretenimiento": 3, "Ciencia": 2, "Videojuegos": 2, "Opinión": 1}
+AUTHORS = {"Tepokato": 8, "Invitado": 1}
+WORDS = """
+análisis anuncio aplicación batería cámara canción comunidad compañía computadora consola contexto datos
+desarrollo diseño dispositivo empresa energía equipo estudio experiencia futuro gobierno historia impacto
+industria información innovación internet jugadores lanzamiento mercado modelo mundo noticia pantalla
+plataforma precio problema proyecto público rendimiento red región servicio sistema sociedad usuarios
+versión video mejora nuevo rápido digital global local abierto seguro potente pequeño grande claro
+""".split()
+
+
+def tag_vocabulary() -> tuple[list[str], list[float]]:
+    tags = POPULAR_TAGS + [f"tema {number}" for number in range(LONG_TAIL_TAGS)]
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(tags))]
+    return tags, weights
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choices(WORDS, k=words))
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng: random.Random) -> str:
+    sentences = [sentence(rng, rng.randint(8, 22)) for _ in range(rng.randint(2, 6))]
+    roll = rng.random()
+    if roll < 0.15:
+        sentences[0] = f"{sentences[0]} Más detalles en [la fuente](https://example.com/{rng.randrange(10**6)})."
+    elif roll < 0.3:
+        sentences[-1] = f"Lo **importante** es el *contexto*: {sentences[-1]}"
+    elif roll < 0.35:
+        sentences[-1] = f"{sentences[-1]} Usa `{rng.choice(WORDS)}()` con cuidado."
+    return "\n".join(sentences)
+
+
+def synthetic_body(rng: random.Random) -> str:
+    blocks: list[str] = []
+    for number in range(max(2, min(200, int(rng.lognormvariate(2.0, 0.8))))):
+        roll = rng.random()
+        if number and roll < 0.12:
+            blocks.append(f"## {sentence(rng, rng.randint(3, 7))[:-1]}")
+        elif roll < 0.2:
+            blocks.append("\n".join(f"- {sentence(rng, rng.randint(4, 10))}" for _ in range(rng.randint(2, 5))))
+        elif roll < 0.24:
+            blocks.append("\n".join(f"{item}. {sentence(rng, 6)}" for item in range(1, rng.randint(3, 6))))
+        elif roll < 0.27:
+            blocks.append(f"> {sentence(rng, rng.randint(8, 16))}")
+        elif roll < 0.29:
+            blocks.append("```python\nfor item in range(10):\n    print(item)\n```")
+        else:
+            blocks.append(paragraph(rng))
+    return "\n\n".join(blocks)
+
+
+def synthetic_fields(rng: random.Random, number: int, tags: list[str], weights: list[float]) -> dict[str, str]:
+    """Field values for post ``number``, keyed like ``FIELD_LABELS`` values."""
+    published_at = dt.datetime(2019, 1, 1) + dt.timedelta(minutes=rng.randrange(7 * 365 * 24 * 60))
+    title = sentence(rng, rng.randint(4, 10))[:-1]
+    return {
+        "title": title,
+        "body": synthetic_body(rng),
+        "tags": ", ".join(dict.fromkeys(rng.choices(tags, weights=weights, k=rng.randint(1, 6)))),
+        "date": published_at.strftime("%Y-%m-%d"),
+        "time": published_at.strftime("%H:%M"),
+        "author": rng.choices(list(AUTHORS), weights=list(AUTHORS.values()))[0],
+        "summary": sentence(rng, rng.randint(12, 30)),
+        "featured_image": rng.choice(["pebe1.png", "pebe2.png", "ram-ia.png", "2025anxina.png", "amaember01.png"]),
+        "featured_image_alt": f"Imagen de {title.lower()}",
+        "slug": f"post-sintetico-{number}",
+        "category": rng.choices(list(CATEGORIES), weights=list(CATEGORIES.values()))[0],
+        "status": "draft" if rng.random() < 0.03 else "published",
+        "notes": "",
+    }
+
+
+def write_corpus(posts_dir: Path, count: int, seed: int = 2025) -> None:
+    posts_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    tags, weights = tag_vocabulary()
+    for number in range(count):
+        fields = synthetic_fields(rng, number, tags, weights)
+        (posts_dir / f"{fields['slug']}.txt").write_text(render_source(fields), encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", type=Path, help="Directorio donde escribir los .txt")
+    parser.add_argument("--posts", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=2025)
+    args = parser.parse_args()
+    write_corpus(args.output, args.posts, args.seed)
+
+
+if __name__ == "__main__":
+    main()
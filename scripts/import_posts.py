@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Import posts from a JSONL or CSV export into posts/*.txt or the post store.
+
+The export is streamed in batches: worker processes validate and format each
+batch while this process checks its slugs against everything already
+imported and writes it out. After every batch a checkpoint records how many
+rows are done, so an interrupted import resumes where it stopped and memory
+stays bounded by the batch size, not the size of the export.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import csv
+import dataclasses
+import datetime as dt
+import itertools
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import build_posts
+from build_posts import FIELD_LABELS, Post, PostStore, StoreError, hash_bytes, render_source, slugify
+
+FIELDS = tuple(FIELD_LABELS.values())
+STATUSES = ("published", "draft")
+SLUG_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+BATCH_SIZE = 500
+# Bodies of long articles easily exceed csv's default 128 KiB field limit.
+csv.field_size_limit(2**31 - 1)
+
+Row = tuple[int, "str | dict"]
+Prepared = tuple[int, "dict[str, str] | None", str]
+
+
+def read_rows(path: Path, input_format: str) -> Iterator[str | dict]:
+    """CSV rows as dicts, JSONL records as raw lines for the workers to parse."""
+    with path.open(encoding="utf-8", newline="") as handle:
+        if input_format == "csv":
+            yield from csv.DictReader(handle)
+        else:
+            yield from (line for line in handle if line.strip())
+
+
+def validate(fields: dict[str, str]) -> list[str]:
+    """Normalize ``fields`` in place and return what is wrong with them."""
+    errors = []
+    if not fields["title"]:
+        errors.append("falta el título")
+    date, time = fields["date"], fields["time"]
+    if len(date) > 10 and not time:
+        # Exports often carry a single ISO timestamp (2021-03-04T10:20:00);
+        # the site has no time zones, so any offset is dropped.
+        date, _, time = date.replace("T", " ").partition(" ")
+    if len(time) > 5 and time[5] in ":.+-Z":
+        time = time[:5]
+    try:
+        fields["date"] = dt.datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        errors.append(f"fecha inválida: {date!r}")
+    try:
+        fields["time"] = dt.datetime.strptime(time, "%H:%M").strftime("%H:%M")
+    except ValueError:
+        errors.append(f"hora inválida: {time!r}")
+    fields["slug"] = fields["slug"] or slugify(fields["title"])
+    if not SLUG_PATTERN.fullmatch(fields["slug"]):
+        errors.append(f"slug inválido: {fields['slug']!r}")
+    fields["status"] = fields["status"].lower() or "published"
+    if fields["status"] not in STATUSES:
+        errors.append(f"estado inválido: {fields['status']!r}")
+    for key, value in fields.items():
+        # parse_post would read such a line as the start of another field.
+        if any(line.strip() in FIELD_LABELS for line in value.splitlines()):
+            errors.append(f"el campo {key} contiene una línea reservada")
+    return errors
+
+
+def prepare_row(row: str | dict, columns: dict[str, str]) -> tuple[dict[str, str] | None, str]:
+    """Return the fields and source text of one row, or None and the error."""
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except json.JSONDecodeError as exc:
+            return None, f"JSON inválido: {exc.msg}"
+        if not isinstance(row, dict):
+            return None, "se esperaba un objeto JSON"
+    fields: dict[str, str] = {}
+    for field in FIELDS:
+        value = row.get(columns.get(field, field))
+        if value is None:
+            value = ""
+        elif isinstance(value, list):
+            value = ", ".join(str(item).strip() for item in value)
+        fields[field] = str(value).strip()
+    errors = validate(fields)
+    if errors:
+        return None, "; ".join(errors)
+    return fields, render_source(fields)
+
+
+def prepare_batch(rows: list[Row], columns: dict[str, str]) -> list[Prepared]:
+    return [(number, *prepare_row(row, columns)) for number, row in rows]
+
+
+def prepared_batches(rows: Iterable[Row], columns: dict[str, str], workers: int, size: int) -> Iterator[list[Prepared]]:
+    """Prepare ``rows`` in batches of ``size``, in order, with at most two batches per worker in flight."""
+    iterator = iter(rows)
+    batches = iter(lambda: list(itertools.islice(iterator, size)), [])
+    if workers <= 1:
+        yield from (prepare_batch(batch, columns) for batch in batches)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: collections.deque = collections.deque()
+        for batch in batches:
+            pending.append(executor.submit(prepare_batch, batch, columns))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+@dataclasses.dataclass(slots=True)
+class ImportStats:
+    rows: int = 0
+    imported: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    duplicates: int = 0
+
+
+class Destination:
+    """Where imported posts go, and the slugs already taken there.
+
+    A slug counts as taken when the store or ``posts/`` already has it. The
+    same content under the same slug is not a duplicate but a row imported
+    before an interruption, and is skipped. Drafts always become ``.txt``
+    sources: the build forgets stored drafts that have no source file.
+    """
+
+    def __init__(self, store: PostStore, into_store: bool) -> None:
+        self.store = store
+        self.into_store = into_store
+        self.hashes = store.source_hashes()
+        self.batch: list[Post] = []
+
+    def known_hash(self, slug: str) -> str | None:
+        path = build_posts.POSTS_DIR / f"{slug}.txt"
+        if path.exists():
+            return hash_bytes(path.read_bytes())
+        return self.hashes.get(slug)
+
+    def add(self, fields: dict[str, str], source: str) -> bool:
+        """Queue one post; False when it is already there."""
+        data = source.encode("utf-8")
+        digest = hash_bytes(data)
+        known = self.known_hash(fields["slug"])
+        if known == digest:
+            return False
+        if known is not None:
+            raise KeyError(fields["slug"])
+        path = build_posts.POSTS_DIR / f"{fields['slug']}.txt"
+        if self.into_store and fields["status"] == "published":
+            # The same values parse_post would read back from the source.
+            tags = [tag.strip() for tag in fields["tags"].split(",") if tag.strip()]
+            alt = fields["featured_image_alt"] or f"Imagen destacada de {fields['title']}"
+            values = {**fields, "tags": tags, "featured_image_alt": alt}
+            self.batch.append(Post(**values, source_path=path, source_hash=digest))
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        self.hashes[fields["slug"]] = digest
+        return True
+
+    def flush(self) -> None:
+        self.store.upsert(self.batch)
+        self.batch.clear()
+
+
+def load_checkpoint(path: Path, source: Path) -> ImportStats:
+    if not path.exists():
+        return ImportStats()
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data["input"] != source.name or data["size"] != source.stat().st_size:
+        raise SystemExit(f"{path} corresponde a otra exportación; usa --restart para empezar de nuevo.")
+    return ImportStats(**data["stats"])
+
+
+def save_checkpoint(path: Path, source: Path, stats: ImportStats) -> None:
+    data = {"input": source.name, "size": source.stat().st_size, "stats": dataclasses.asdict(stats)}
+    build_posts.write_bytes_atomic(path, json.dumps(data).encode("utf-8"))
+
+
+def import_posts(
+    source: Path,
+    input_format: str,
+    columns: dict[str, str],
+    into_store: bool,
+    workers: int,
+    checkpoint: Path,
+    batch_size: int = BATCH_SIZE,
+) -> ImportStats:
+    """Import ``source`` from the row after the last checkpoint and return the totals."""
+    stats = load_checkpoint(checkpoint, source)
+    rows = itertools.islice(enumerate(read_rows(source, input_format), 1), stats.rows, None)
+    with PostStore() as store:
+        destination = Destination(store, into_store)
+        for batch in prepared_batches(rows, columns, workers, batch_size):
+            for number, fields, result in batch:
+                if fields is None:
+                    stats.invalid += 1
+                    print(f"registro {number}: {result}", file=sys.stderr)
+                    continue
+                try:
+                    added = destination.add(fields, result)
+                except KeyError:
+                    stats.duplicates += 1
+                    print(f"registro {number}: slug duplicado: {fields['slug']!r}", file=sys.stderr)
+                    continue
+                if added:
+                    stats.imported += 1
+                else:
+                    stats.unchanged += 1
+            destination.flush()
+            stats.rows = batch[-1][0]
+            save_checkpoint(checkpoint, source, stats)
+    checkpoint.unlink(missing_ok=True)
+    return stats
+
+
+def parse_columns(pairs: list[str]) -> dict[str, str]:
+    columns = {}
+    for pair in pairs:
+        field, separator, column = pair.partition("=")
+        if not separator or field not in FIELDS:
+            raise SystemExit(f"--field espera CAMPO=COLUMNA con CAMPO en: {', '.join(FIELDS)}")
+        columns[field] = column
+    return columns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("export", type=Path, help="Exportación .jsonl o .csv")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="Formato (por defecto, según la extensión).")
+    parser.add_argument(
+        "--store",
+        action="store_true",
+        help="Guarda los posts publicados directamente en el almacén en lugar de escribir .txt en posts/.",
+    )
+    parser.add_argument(
+        "--field",
+        action="append",
+        default=[],
+        metavar="CAMPO=COLUMNA",
+        help="Columna de la exportación que corresponde a un campo del post (repetible).",
+    )
+    parser.add_argument("--root", type=Path, metavar="RUTA", help="Raíz del sitio (por defecto, la del repositorio).")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N", help="Procesos para validar registros.")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, metavar="N", help="Registros por lote.")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        metavar="RUTA",
+        help="Punto de control para reanudar (por defecto, junto a la exportación).",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignora el punto de control y empieza desde el principio.")
+    args = parser.parse_args()
+
+    if args.root:
+        build_posts.set_root(args.root)
+    input_format = args.format or ("csv" if args.export.suffix.lower() == ".csv" else "jsonl")
+    checkpoint = args.checkpoint or args.export.with_name(f"{args.export.name}.checkpoint.json")
+    if args.restart:
+        checkpoint.unlink(missing_ok=True)
+    try:
+        stats = import_posts(
+            args.export,
+            input_format,
+            parse_columns(args.field),
+            args.store,
+            max(1, args.jobs),
+            checkpoint,
+            max(1, args.batch),
+        )
+    except StoreError as exc:
+        raise SystemExit(str(exc)) from None
+    print(
+        f"Importados {stats.imported}, sin cambios {stats.unchanged}, "
+        f"inválidos {stats.invalid}, slugs duplicados {stats.duplicates} ({stats.rows} registros)."
+    )
+    if stats.invalid or stats.duplicates:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
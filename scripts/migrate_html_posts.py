@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Turn posts published as HTML before the post store into posts/*.txt sources.
+
+Those pages were written by the first version of build_posts.py and never
+reached the store, so the archive, listings, search index and feeds leave
+them out. Every field of their source is still in the page: this reads it
+back, writes the source and leaves the rest to the next build, which stores
+the post and renders its page again like any other. A page is only
+converted when its body renders back to the same Markdown; anything else is
+reported and left alone.
+
+Run it once, then run build_posts.py.
+"""
+from __future__ import annotations
+
+import argparse
+import html
+import re
+import sys
+from pathlib import Path
+
+import build_posts
+from build_posts import (
+    PostStore,
+    StoreError,
+    load_manifest,
+    normalize_index_image,
+    render_body_markdown,
+    render_source,
+)
+from import_posts import validate
+
+META_PATTERN = re.compile(r'<meta (?:name|property)="([\w:]+)" content="([^"]*)" />')
+BADGE_PATTERN = re.compile(r'<div class="badge">Análisis · (.*)</div>')
+TITLE_PATTERN = re.compile(r"<h1>(.*)</h1>")
+DATE_PATTERN = re.compile(r"<span>(.*) · (.*)</span>")
+SPAN_PATTERN = re.compile(r"<span>(.*)</span>")
+IMAGE_PATTERN = re.compile(r'<img src="([^"]*)" alt="([^"]*)"[^>]*/>')
+PARAGRAPH_PATTERN = re.compile(r"<p>(.*)</p>")
+HEADING_PATTERN = re.compile(r"<h([1-3])>(.*)</h\1>")
+ITEM_PATTERN = re.compile(r"<li>(.*)</li>")
+
+
+def inline_text(content: str) -> str:
+    """The Markdown for the inline HTML the generator wrote: escaped text and images."""
+    content = IMAGE_PATTERN.sub(lambda match: f"![{match[2]}]({match[1]})", content)
+    return html.unescape(content)
+
+
+def markdown_body(lines: list[str]) -> str:
+    """Read rendered body lines back into the Markdown that produces them."""
+    blocks: list[str] = []
+    items: list[str] | None = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped == "<ul>" and items is None:
+            items = []
+        elif stripped == "</ul>" and items is not None:
+            blocks.append("\n".join(items))
+            items = None
+        elif items is not None and (match := ITEM_PATTERN.fullmatch(stripped)):
+            items.append(f"- {inline_text(match[1])}")
+        elif match := PARAGRAPH_PATTERN.fullmatch(stripped):
+            blocks.append(inline_text(match[1]))
+        elif match := HEADING_PATTERN.fullmatch(stripped):
+            blocks.append(f"{'#' * int(match[1])} {inline_text(match[2])}")
+        elif IMAGE_PATTERN.fullmatch(stripped):
+            blocks.append(inline_text(stripped))
+        else:
+            raise ValueError(f"línea no reconocida: {stripped[:60]!r}")
+    if items is not None:
+        raise ValueError("lista sin cerrar")
+    return "\n\n".join(blocks)
+
+
+def legacy_fields(text: str, slug: str) -> dict[str, str]:
+    """The source fields of a legacy post page; ValueError when it is not one."""
+    meta = {name: html.unescape(value) for name, value in META_PATTERN.findall(text)}
+    start, end = text.find('<article class="post">'), text.find('<div class="post__tags">')
+    if start < 0 or end < 0:
+        raise ValueError("no es una página de post")
+    lines = [line.strip() for line in text[start:end].splitlines()[1:]]
+    # The fixed header of the old template: badge, title, date and author,
+    # then the featured image.
+    header = lines[:7] + [""] * (7 - len(lines[:7]))
+    badge = BADGE_PATTERN.fullmatch(header[0])
+    title = TITLE_PATTERN.fullmatch(header[1])
+    date = DATE_PATTERN.fullmatch(header[3])
+    author = SPAN_PATTERN.fullmatch(header[4])
+    image = IMAGE_PATTERN.fullmatch(header[6])
+    meta_block = (header[2], header[5]) == ('<div class="post__meta">', "</div>")
+    if not (badge and title and date and author and image and meta_block):
+        raise ValueError("cabecera del post no reconocida")
+
+    body = markdown_body(lines[7:])
+    if markdown_body(render_body_markdown(body).splitlines()) != body:
+        raise ValueError("el cuerpo no se reproduce igual desde Markdown")
+    tags_html = text[end : text.find("</div>", end)]
+    tags = [html.unescape(tag) for tag in re.findall(r"<span>#(.*)</span>", tags_html)]
+    title_text = html.unescape(title[1])
+    summary = meta.get("description", "")
+    featured_image = html.unescape(image[1])
+    return {
+        "title": title_text,
+        "body": body,
+        "tags": ", ".join(tags),
+        "date": html.unescape(date[1]),
+        "time": html.unescape(date[2]),
+        "author": html.unescape(author[1]),
+        # The page falls back to the title when the source had no summary.
+        "summary": "" if summary == title_text else summary,
+        # An empty image still rendered as the bare directory.
+        "featured_image": "" if featured_image.endswith("/") else normalize_index_image(featured_image),
+        "featured_image_alt": html.unescape(image[2]),
+        "slug": slug,
+        "category": html.unescape(badge[1]),
+        "status": "published",
+        "notes": "",
+    }
+
+
+def migrate(paths: list[Path]) -> tuple[int, int]:
+    """Write a source for each legacy page in ``paths``; return (converted, skipped)."""
+    converted = skipped = 0
+    for path in paths:
+        try:
+            fields = legacy_fields(path.read_text(encoding="utf-8"), path.stem)
+            errors = validate(fields)
+            if errors:
+                raise ValueError("; ".join(errors))
+        except ValueError as exc:
+            skipped += 1
+            print(f"{path.name}: {exc}", file=sys.stderr)
+            continue
+        path.with_suffix(".txt").write_text(render_source(fields), encoding="utf-8")
+        converted += 1
+    return converted, skipped
+
+
+def legacy_pages() -> list[Path]:
+    """Flat post pages that neither the store, a source nor the manifest accounts for."""
+    with PostStore() as store:
+        known = set(store.source_hashes())
+    manifest = load_manifest()
+    generated = {entry.get("path", f"{slug}.html") for slug, entry in manifest["posts"].items()}
+    generated.update(manifest.get("redirects", {}).get("paths", ()))
+    return [
+        path
+        for path in sorted(build_posts.POSTS_DIR.glob("*.html"))
+        if path.stem not in known and path.name not in generated and not path.with_suffix(".txt").exists()
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", type=Path, metavar="RUTA", help="Raíz del sitio (por defecto, la del repositorio).")
+    args = parser.parse_args()
+
+    if args.root:
+        build_posts.set_root(args.root)
+    try:
+        converted, skipped = migrate(legacy_pages())
+    except StoreError as exc:
+        raise SystemExit(str(exc)) from None
+    print(f"Convertidos {converted}, omitidos {skipped}. Ejecuta build_posts.py para guardarlos y regenerarlos.")
+    if skipped:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()